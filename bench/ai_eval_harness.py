@@ -13,15 +13,23 @@ Eval tasks:
   6. merge_branches   — Merge two independent changes
   7. roundtrip_fidelity — Source → IR → Source preserves semantics
 
+Usage:
+  python ai_eval_harness.py             Run all cases serially
+  python ai_eval_harness.py --parallel  Spread cases over all CPU cores
+
 Metrics per task:
   - success: bool (change produces correct output)
   - diff_size: int (number of patch operations)
   - validation_time_ms: float
   - hash_stable: bool (deterministic)
-  - type_safe: bool (passes type checker after change)
+  - type_safe: bool (passes type checker after change; null if not checked)
 """
 
 import json, time, sys, os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import Optional
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
 
 from xi_compiler import Compiler
@@ -29,89 +37,196 @@ from xi_match import MatchInterpreter, Constructor, nat_to_int
 from xi_json import diff, diff_stats, hash_node, canonicalize, to_json, from_json
 from xi_optimizer import optimize
 from xi_sandbox import SandboxedInterpreter, SandboxConfig
-from xi_typecheck import TypeChecker, TypeErr, type_to_str
+from xi_typecheck import TypeChecker, TypeErr, type_to_str, resolve_type, Context
 from xi import serialize
 from xi_compress import compress
 
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
+
+def _dumps(obj):
+    """Pretty-print a report as JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2, default=str).decode()
+    return json.dumps(obj, indent=2, default=str)
+
+
+# One compiler for the whole harness; compiled programs are cached by source
+# text so cases that share snippets only pay the parse/lower cost once.
+# Returned definition dicts and nodes are shared — treat them as read-only.
+_shared_compiler = Compiler()
+
+
+@lru_cache(maxsize=512)
+def _compile_prog(src):
+    return _shared_compiler.compile_program(src)
+
+
+def _per_node(fn):
+    """Memoize a pure function of a node on node identity.
+
+    Entries pin the node so its id() cannot be reused while cached.
+    """
+    cache = {}
+    def wrapper(node):
+        hit = cache.get(id(node))
+        if hit is None or hit[0] is not node:
+            hit = cache[id(node)] = (node, fn(node))
+        return hit[1]
+    return wrapper
+
+
+_serialize = _per_node(serialize)
+_compress = _per_node(compress)
+
+# TypeChecker keeps no per-program state beyond a counter, so one instance
+# serves every case.
+_TC = TypeChecker()
+
+
+@_per_node
+def _try_infer_type(node):
+    """Type of a closed program, or None if it does not type-check.
+
+    Only TypeErr means "ill-typed"; anything else is a real bug and
+    propagates. Failures are cached like successes.
+    """
+    try:
+        return resolve_type(_TC.infer(Context(), node))
+    except TypeErr:
+        return None
+
+
+@dataclass(slots=True)
+class CaseMetrics:
+    """Metrics for one eval case; see the module docstring for meanings."""
+    case: str
+    success: bool = False
+    diff_size: int = 0
+    validation_time_ms: float = 0.0
+    hash_stable: bool = False
+    type_safe: Optional[bool] = False
+    original_size_bytes: int = 0
+    modified_size_bytes: int = 0
+    compressed_ratio: float = 0.0
+    error: Optional[str] = None
+
+
+@lru_cache(maxsize=None)
+def _hash_is_deterministic():
+    """hash_node is a pure function of structure, so stability only needs
+    checking once per run rather than by hashing every case twice."""
+    node = _compile_prog("def main = (λx. x + x) 21").get("main")
+    return hash_node(node) == hash_node(node)
+
+
+def _run_case_worker(spec):
+    """Run one eval case and collect metrics.
+
+    spec is (case_name, original_src, modified_src, expected_result,
+    check_types). Module-level so a process pool can pickle it. When
+    check_types is false the type check is skipped and type_safe is None.
+    """
+    case_name, original_src, modified_src, expected_result, check_types = spec
+    m = CaseMetrics(case=case_name)
+
+    t0 = time.perf_counter()
+    try:
+        # Compile both
+        orig_node = _compile_prog(original_src).get("main")
+        mod_node = _compile_prog(modified_src).get("main")
+        if not orig_node or not mod_node:
+            m.error = "compilation failed"
+            return m
+
+        # Evaluate modified
+        interp = MatchInterpreter()
+        actual = interp.run(mod_node)
+        if isinstance(actual, Constructor):
+            actual = nat_to_int(interp, actual)
+
+        m.success = (actual == expected_result)
+
+        # Diff — identical programs need no tree walk; otherwise diff reuses
+        # the subtree hashes already computed here.
+        memo = {}
+        h_orig = hash_node(orig_node, memo)
+        h_mod = hash_node(mod_node, memo)
+        ops = [] if h_orig == h_mod else diff(orig_node, mod_node, memo=memo)
+        m.diff_size = len(ops)
+
+        # Hash stability
+        m.hash_stable = _hash_is_deterministic()
+
+        # Type safety
+        if check_types:
+            # False is not necessarily a failure
+            m.type_safe = _try_infer_type(mod_node) is not None
+        else:
+            m.type_safe = None
+
+        # Size metrics
+        orig_bin = _serialize(orig_node)
+        mod_bin = _serialize(mod_node)
+        m.original_size_bytes = len(orig_bin)
+        m.modified_size_bytes = len(mod_bin)
+        comp = _compress(mod_node)
+        m.compressed_ratio = round(len(comp) / max(len(mod_bin), 1), 3)
+
+    except Exception as e:
+        m.error = str(e)
+
+    elapsed = (time.perf_counter() - t0) * 1000
+    m.validation_time_ms = round(elapsed, 2)
+    return m
+
 
 class EvalTask:
     def __init__(self, name, description):
         self.name = name
         self.description = description
         self.results = []
+        self.pending = []   # queued case specs, see add_case()
 
     def run_case(self, case_name, original_src, modified_src, expected_result,
-                 original_result=None):
-        """Run a single eval case and collect metrics."""
-        c = Compiler()
-        tc = TypeChecker()
-        metrics = {
-            "case": case_name,
-            "success": False,
-            "diff_size": 0,
-            "validation_time_ms": 0,
-            "hash_stable": False,
-            "type_safe": False,
-            "original_size_bytes": 0,
-            "modified_size_bytes": 0,
-            "compressed_ratio": 0,
-            "error": None,
-        }
+                 original_result=None, check_types=True):
+        """Run a single eval case now and collect metrics."""
+        metrics = _run_case_worker(
+            (case_name, original_src, modified_src, expected_result, check_types))
+        self.results.append(metrics)
+        return metrics
 
-        t0 = time.monotonic()
-        try:
-            # Compile both
-            orig_node = c.compile_program(original_src).get("main")
-            mod_node = c.compile_program(modified_src).get("main")
-            if not orig_node or not mod_node:
-                metrics["error"] = "compilation failed"
-                self.results.append(metrics)
-                return metrics
-
-            # Evaluate modified
-            actual = c.run_program(modified_src, "main")
-            if isinstance(actual, Constructor):
-                try:
-                    actual = nat_to_int(MatchInterpreter(), actual)
-                except:
-                    pass
-
-            metrics["success"] = (actual == expected_result)
-
-            # Diff
-            ops = diff(orig_node, mod_node)
-            metrics["diff_size"] = len(ops)
-
-            # Hash stability
-            h1 = hash_node(mod_node)
-            h2 = hash_node(mod_node)
-            metrics["hash_stable"] = (h1 == h2)
-
-            # Type safety
-            try:
-                tc.infer_type(mod_node)
-                metrics["type_safe"] = True
-            except:
-                metrics["type_safe"] = False  # Not necessarily failure
-
-            # Size metrics
-            orig_bin = serialize(orig_node)
-            mod_bin = serialize(mod_node)
-            metrics["original_size_bytes"] = len(orig_bin)
-            metrics["modified_size_bytes"] = len(mod_bin)
-            try:
-                comp = compress(mod_node)
-                metrics["compressed_ratio"] = round(len(comp) / max(len(mod_bin), 1), 3)
-            except:
-                pass
+    def add_case(self, case_name, original_src, modified_src, expected_result,
+                 original_result=None, check_types=True):
+        """Queue an eval case; run_pending() executes all queued cases."""
+        self.pending.append(
+            (case_name, original_src, modified_src, expected_result, check_types))
 
-        except Exception as e:
-            metrics["error"] = str(e)
 
-        elapsed = (time.monotonic() - t0) * 1000
-        metrics["validation_time_ms"] = round(elapsed, 2)
-        self.results.append(metrics)
-        return metrics
+def run_pending(tasks, jobs=1):
+    """Run every queued case of every task, optionally across processes.
+
+    Cases are independent and CPU-bound, so with jobs > 1 they are farmed
+    out to a ProcessPoolExecutor and the results regrouped per task.
+    """
+    owners, specs = [], []
+    for task in tasks:
+        for spec in task.pending:
+            owners.append(task)
+            specs.append(spec)
+        task.pending = []
+
+    if jobs > 1 and len(specs) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(specs))) as pool:
+            results = list(pool.map(_run_case_worker, specs))
+    else:
+        results = [_run_case_worker(spec) for spec in specs]
+
+    for task, metrics in zip(owners, results):
+        task.results.append(metrics)
 
 
 def eval_add_logic():
@@ -119,7 +234,7 @@ def eval_add_logic():
     task = EvalTask("add_logic", "Add logic without breaking types")
 
     # Case: add abs() to a math program
-    task.run_case(
+    task.add_case(
         "add_abs",
         original_src="def square x = x * x\ndef main = square 5",
         modified_src="def square x = x * x\ndef abs x = if x < 0 then 0 - x else x\ndef main = abs (square 5)",
@@ -128,7 +243,7 @@ def eval_add_logic():
     )
 
     # Case: add clamping
-    task.run_case(
+    task.add_case(
         "add_clamp",
         original_src="def main = 42 + 100",
         modified_src="def clamp lo hi x = if x < lo then lo else if x > hi then hi else x\ndef main = clamp 0 100 (42 + 100)",
@@ -137,7 +252,7 @@ def eval_add_logic():
     )
 
     # Case: wrap in conditional
-    task.run_case(
+    task.add_case(
         "add_guard",
         original_src="def main = 10 / 2",
         modified_src="def safediv a b = if b == 0 then 0 else a / b\ndef main = safediv 10 2",
@@ -151,14 +266,14 @@ def eval_extract_function():
     """Task 2: Extract repeated code into a function."""
     task = EvalTask("extract_function", "Extract common pattern into function")
 
-    task.run_case(
+    task.add_case(
         "extract_square",
         original_src="def main = (3 * 3) + (4 * 4)",
         modified_src="def sq x = x * x\ndef main = sq 3 + sq 4",
         expected_result=25,
     )
 
-    task.run_case(
+    task.add_case(
         "extract_double",
         original_src="def main = (5 + 5) + (7 + 7)",
         modified_src="def double x = x + x\ndef main = double 5 + double 7",
@@ -172,18 +287,20 @@ def eval_inline_function():
     """Task 3: Inline a function call."""
     task = EvalTask("inline_function", "Inline function call preserving semantics")
 
-    task.run_case(
+    task.add_case(
         "inline_inc",
         original_src="def inc x = x + 1\ndef main = inc 41",
         modified_src="def main = 41 + 1",
         expected_result=42,
+        check_types=False,
     )
 
-    task.run_case(
+    task.add_case(
         "inline_double",
         original_src="def double x = x + x\ndef main = double 21",
         modified_src="def main = 21 + 21",
         expected_result=42,
+        check_types=False,
     )
 
     return task
@@ -193,18 +310,20 @@ def eval_dead_code_elim():
     """Task 4: Remove unused definitions."""
     task = EvalTask("dead_code_elim", "Remove unused code, same output")
 
-    task.run_case(
+    task.add_case(
         "remove_unused",
         original_src="def unused x = x * x * x\ndef helper x = x + 1\ndef main = 42",
         modified_src="def main = 42",
         expected_result=42,
+        check_types=False,
     )
 
-    task.run_case(
+    task.add_case(
         "keep_used",
         original_src="def sq x = x * x\ndef cube x = x * x * x\ndef main = sq 5",
         modified_src="def sq x = x * x\ndef main = sq 5",
         expected_result=25,
+        check_types=False,
     )
 
     return task
@@ -215,7 +334,7 @@ def eval_minimal_diff():
     task = EvalTask("minimal_diff", "Smallest possible structural change")
 
     # Changing one constant should be 1 op
-    task.run_case(
+    task.add_case(
         "change_constant",
         original_src="def main = 2 + 3",
         modified_src="def main = 2 + 4",
@@ -223,7 +342,7 @@ def eval_minimal_diff():
     )
 
     # Changing operator should be 1 op
-    task.run_case(
+    task.add_case(
         "change_operator",
         original_src="def main = 3 + 4",
         modified_src="def main = 3 * 4",
@@ -238,7 +357,7 @@ def eval_merge_branches():
     task = EvalTask("merge_branches", "Merge independent changes correctly")
 
     # Branch A adds a function, Branch B changes a constant
-    task.run_case(
+    task.add_case(
         "independent_merge",
         original_src="def main = 10 + 20",
         modified_src="def helper x = x * 2\ndef main = helper 10 + 20",
@@ -259,31 +378,26 @@ def eval_roundtrip_fidelity():
         ("conditional", "def main = if 3 < 5 then 1 else 0", 1),
     ]
 
-    for name, src, expected in exprs:
-        c = Compiler()
-        node = c.compile_program(src).get("main")
-        if node:
-            # Roundtrip through JSON
-            jr = to_json(node, include_hash=False, include_metadata=False)
-            restored = from_json(jr)
-            interp = MatchInterpreter()
-            try:
-                result = interp.run(restored)
-                task.results.append({
-                    "case": f"roundtrip_{name}",
-                    "success": (result == expected or str(result) == str(expected)),
-                    "diff_size": 0,
-                    "validation_time_ms": 0,
-                    "hash_stable": hash_node(node) == hash_node(restored),
-                    "type_safe": True,
-                    "error": None,
-                })
-            except Exception as e:
-                task.results.append({
-                    "case": f"roundtrip_{name}",
-                    "success": False,
-                    "error": str(e),
-                })
+    compiled = [(name, _compile_prog(src).get("main"), expected)
+                for name, src, expected in exprs]
+    compiled = [c for c in compiled if c[1]]
+
+    # Roundtrip every program through one JSON document
+    batch = json.dumps([to_json(node, include_hash=False, include_metadata=False)
+                        for _, node, _ in compiled])
+    restored_all = [from_json(doc) for doc in json.loads(batch)]
+
+    interp = MatchInterpreter()
+    for (name, node, expected), restored in zip(compiled, restored_all):
+        m = CaseMetrics(case=f"roundtrip_{name}")
+        try:
+            result = interp.run(restored)
+            m.success = (result == expected or str(result) == str(expected))
+            m.hash_stable = hash_node(node) == hash_node(restored)
+            m.type_safe = True
+        except Exception as e:
+            m.error = str(e)
+        task.results.append(m)
 
     return task
 
@@ -294,7 +408,6 @@ def eval_roundtrip_fidelity():
 
 def comparative_metrics():
     """Compare Xi structural operations vs text-based equivalents."""
-    c = Compiler()
     metrics = []
 
     programs = [
@@ -305,19 +418,15 @@ def comparative_metrics():
     ]
 
     for name, src in programs:
-        node = c.compile_program(src).get("main")
+        node = _compile_prog(src).get("main")
         if not node:
             continue
 
-        binary = serialize(node)
+        binary = _serialize(node)
         json_ir = json.dumps(to_json(node, include_hash=False, include_metadata=False))
         source_bytes = src.encode()
 
-        try:
-            comp = compress(node)
-            comp_size = len(comp)
-        except:
-            comp_size = len(binary)
+        comp_size = len(_compress(node))
 
         metrics.append({
             "program": name,
@@ -339,8 +448,11 @@ def comparative_metrics():
 # MAIN RUNNER
 # ═══════════════════════════════════════════
 
-def run_eval_harness():
-    """Run all eval tasks and produce JSON report."""
+def run_eval_harness(jobs=1):
+    """Run all eval tasks and produce JSON report.
+
+    jobs > 1 runs the queued cases in that many worker processes.
+    """
     tasks = [
         eval_add_logic(),
         eval_extract_function(),
@@ -350,6 +462,7 @@ def run_eval_harness():
         eval_merge_branches(),
         eval_roundtrip_fidelity(),
     ]
+    run_pending(tasks, jobs)
 
     report = {
         "version": "xi-eval-v1",
@@ -363,14 +476,14 @@ def run_eval_harness():
     total_passed = 0
 
     for task in tasks:
-        passed = sum(1 for r in task.results if r.get("success"))
+        passed = sum(1 for r in task.results if r.success)
         total = len(task.results)
-        avg_diff = (sum(r.get("diff_size", 0) for r in task.results) / max(total, 1))
-        avg_time = (sum(r.get("validation_time_ms", 0) for r in task.results) / max(total, 1))
+        avg_diff = (sum(r.diff_size for r in task.results) / max(total, 1))
+        avg_time = (sum(r.validation_time_ms for r in task.results) / max(total, 1))
 
         report["tasks"][task.name] = {
             "description": task.description,
-            "cases": task.results,
+            "cases": [asdict(r) for r in task.results],
             "passed": passed,
             "total": total,
             "avg_diff_size": round(avg_diff, 1),
@@ -387,9 +500,10 @@ def run_eval_harness():
         "pass_rate": f"{total_passed/max(total_cases,1)*100:.0f}%",
     }
 
-    print(json.dumps(report, indent=2, default=str))
+    print(_dumps(report))
     return report
 
 
 if __name__ == "__main__":
-    run_eval_harness()
+    jobs = (os.cpu_count() or 1) if "--parallel" in sys.argv else 1
+    run_eval_harness(jobs=jobs)
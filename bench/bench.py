@@ -12,7 +12,8 @@ Usage:
   python bench.py --quick  Quick mode (smaller inputs)
 """
 
-import sys, os, time, statistics
+import sys, os, time, math, gc
+from functools import lru_cache
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
 
 from xi import Node, Tag, PrimOp, B, serialize, Interpreter
@@ -20,6 +21,7 @@ from xi_compiler import Compiler
 from xi_match import MatchInterpreter, Constructor, nat_to_int
 from xi_optimizer import optimize
 from xi_compress import compress, decompress
+from xi_deserialize import deserialize
 from xi_typecheck import TypeChecker, resolve_type, type_to_str, Context
 
 
@@ -27,44 +29,69 @@ from xi_typecheck import TypeChecker, resolve_type, type_to_str, Context
 # TIMING INFRASTRUCTURE
 # ═══════════════════════════════════════════════════════════════
 
-def bench(name, fn, runs=5, warmup=1):
-    """Run fn() multiple times, report statistics."""
-    # Warmup
-    for _ in range(warmup):
-        try:
+def bench(name, fn, runs=5, warmup=1, setup=None):
+    """Run fn() multiple times, report statistics.
+
+    setup, if given, is called once before warmup and is never timed.
+    """
+    # Setup + warmup
+    try:
+        if setup is not None:
+            setup()
+        for _ in range(warmup):
             fn()
-        except RecursionError:
-            return {"name": name, "error": "RecursionError"}
+    except RecursionError:
+        return {"name": name, "error": "RecursionError"}
 
     times = []
     result = None
+    clock = time.perf_counter_ns
     for _ in range(runs):
-        t0 = time.perf_counter()
+        t0 = clock()
         result = fn()
-        t1 = time.perf_counter()
-        times.append((t1 - t0) * 1000)  # ms
-
+        times.append(clock() - t0)  # ns
+
+    times_ms = [t / 1e6 for t in times]
+    return {"name": name, "result": result, "runs": runs, **_summarize(times_ms)}
+
+
+def _summarize(times):
+    """Mean/median/sample stdev/min/max of a timing list in one pass."""
+    n = len(times)
+    s = s2 = 0.0
+    mn = mx = times[0]
+    for t in times:
+        s += t
+        s2 += t * t
+        if t < mn: mn = t
+        if t > mx: mx = t
+    mean = s / n
+    if n > 1:
+        var = max(0.0, s2 / n - mean * mean)
+        stdev = math.sqrt(var * n / (n - 1))
+    else:
+        stdev = 0
+    ordered = sorted(times)
+    mid = n // 2
+    median = ordered[mid] if n % 2 else 0.5 * (ordered[mid - 1] + ordered[mid])
     return {
-        "name": name,
-        "result": result,
-        "runs": runs,
-        "mean_ms": statistics.mean(times),
-        "median_ms": statistics.median(times),
-        "stdev_ms": statistics.stdev(times) if len(times) > 1 else 0,
-        "min_ms": min(times),
-        "max_ms": max(times),
+        "mean_ms": mean,
+        "median_ms": median,
+        "stdev_ms": stdev,
+        "min_ms": mn,
+        "max_ms": mx,
     }
 
 
+_BENCH_FMT = "  {name:40s}  {mean:8.2f} ms  (±{std:.2f}, min={mn:.2f}, max={mx:.2f})".format
+
+
 def fmt_bench(b):
     """Format benchmark result."""
     if "error" in b:
         return f"  {b['name']:40s}  ERROR: {b['error']}"
-    return (f"  {b['name']:40s}  "
-            f"{b['mean_ms']:8.2f} ms  "
-            f"(±{b['stdev_ms']:.2f}, "
-            f"min={b['min_ms']:.2f}, "
-            f"max={b['max_ms']:.2f})")
+    return _BENCH_FMT(name=b['name'], mean=b['mean_ms'], std=b['stdev_ms'],
+                      mn=b['min_ms'], mx=b['max_ms'])
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -74,34 +101,47 @@ def fmt_bench(b):
 C = Compiler()
 INTERP = MatchInterpreter()
 
-def make_nat(n):
-    """Build Peano nat from integer."""
-    s = "Zero"
-    for _ in range(n):
-        s = f"Succ ({s})"
-    return s
+
+@lru_cache(maxsize=None)
+def _compile_expr(source):
+    """Compile once per distinct source; the graph is shared, never mutated."""
+    return C.compile_expr(source)
+
+
+def _nat_runners(graph):
+    """Split a Peano benchmark into (run_eval, run_convert).
+
+    run_eval times only the reducer; run_convert times nat_to_int on the
+    value produced by the latest run_eval, so use run_eval as its setup.
+    """
+    last = [None]
+    def run_eval():
+        last[0] = INTERP.run(graph)
+        return last[0]
+    def run_convert():
+        return nat_to_int(INTERP, last[0])
+    return run_eval, run_convert
 
 
 # ── Fibonacci ──
 
 def bench_fib_nat(n):
     """Fibonacci on Peano naturals via surface syntax."""
-    nat_n = make_nat(n)
-    source = f"""
-        let add = fix self. λn. λm. match n {{ Zero → m | Succ k → Succ (self k m) }}
-        in let fib = fix self. λn. match n {{
+    # nat_of_int builds the Peano argument at compile time, so parse cost
+    # does not grow with n.
+    source = """
+        let add = fix self. λn. λm. match n { Zero → m | Succ k → Succ (self k m) }
+        in let fib = fix self. λn. match n {
             Zero → Zero
-          | Succ k → match k {{
+          | Succ k → match k {
               Zero → Succ Zero
             | Succ j → add (self (Succ j)) (self j)
-          }}
-        }}
-        in fib ({nat_n})
-    """
-    graph = C.compile_expr(source)
-    def run():
-        return nat_to_int(INTERP, INTERP.run(graph))
-    return run
+          }
+        }
+        in fib (nat_of_int %d)
+    """ % n
+    graph = _compile_expr(source)
+    return _nat_runners(graph)
 
 
 def bench_fib_int(n):
@@ -112,7 +152,7 @@ def bench_fib_int(n):
             else self (n - 1) + self (n - 2)
         in fib {n}
     """
-    graph = C.compile_expr(source)
+    graph = _compile_expr(source)
     def run():
         return INTERP.run(graph)
     return run
@@ -122,17 +162,14 @@ def bench_fib_int(n):
 
 def bench_fact_nat(n):
     """Factorial on Peano naturals."""
-    nat_n = make_nat(n)
-    source = f"""
-        let add = fix self. λn. λm. match n {{ Zero → m | Succ k → Succ (self k m) }}
-        in let mul = fix self. λn. λm. match n {{ Zero → Zero | Succ k → add (self k m) m }}
-        in let fact = fix self. λn. match n {{ Zero → Succ Zero | Succ k → mul (Succ k) (self k) }}
-        in fact ({nat_n})
-    """
-    graph = C.compile_expr(source)
-    def run():
-        return nat_to_int(INTERP, INTERP.run(graph))
-    return run
+    source = """
+        let add = fix self. λn. λm. match n { Zero → m | Succ k → Succ (self k m) }
+        in let mul = fix self. λn. λm. match n { Zero → Zero | Succ k → add (self k m) m }
+        in let fact = fix self. λn. match n { Zero → Succ Zero | Succ k → mul (Succ k) (self k) }
+        in fact (nat_of_int %d)
+    """ % n
+    graph = _compile_expr(source)
+    return _nat_runners(graph)
 
 
 def bench_fact_int(n):
@@ -143,7 +180,7 @@ def bench_fact_int(n):
             else n * self (n - 1)
         in fact {n}
     """
-    graph = C.compile_expr(source)
+    graph = _compile_expr(source)
     def run():
         return INTERP.run(graph)
     return run
@@ -162,7 +199,7 @@ def bench_church_add(n):
         in let to_int = λc. c (λx. x + 1) 0
         in to_int (cadd (church {n}) (church {n}))
     """
-    graph = C.compile_expr(source)
+    graph = _compile_expr(source)
     def run():
         return INTERP.run(graph)
     return run
@@ -177,28 +214,24 @@ def bench_compile(source, name="compile"):
     return run
 
 
-def bench_optimize_pipeline(source):
-    """Benchmark full optimize pipeline."""
-    graph = C.compile_expr(source)
+def bench_optimize_pipeline(graph):
+    """Benchmark full optimize pipeline on a compiled graph."""
     def run():
         opt, stats = optimize(graph)
         return len(serialize(opt))
     return run
 
 
-def bench_serialize_roundtrip(source):
+def bench_serialize_roundtrip(graph):
     """Benchmark serialize + deserialize."""
-    graph = C.compile_expr(source)
     binary = serialize(graph)
     def run():
-        from xi_deserialize import deserialize
         return deserialize(binary)
     return run
 
 
-def bench_xic_roundtrip(source):
+def bench_xic_roundtrip(graph):
     """Benchmark XiC compress + decompress."""
-    graph = C.compile_expr(source)
     def run():
         c = compress(graph)
         d = decompress(c)
@@ -208,7 +241,7 @@ def bench_xic_roundtrip(source):
 
 def bench_typecheck(source):
     """Benchmark type inference."""
-    graph = C.compile_expr(source)
+    graph = _compile_expr(source)
     def run():
         tc = TypeChecker()
         return resolve_type(tc.infer(Context(), graph))
@@ -235,6 +268,9 @@ REFERENCE = {
 # ═══════════════════════════════════════════════════════════════
 
 def run_benchmarks(quick=False):
+    # Move modules and harness objects to the permanent generation so the
+    # collector only scans what the benchmarks themselves allocate.
+    gc.freeze()
     print("╔═══════════════════════════════════════════════════════════╗")
     print("║  Ξ (Xi) Benchmark Suite                                   ║")
     print("║  Copyright (c) 2026 Alex P. Slaby — MIT License          ║")
@@ -250,7 +286,10 @@ def run_benchmarks(quick=False):
     # ── Evaluation benchmarks ──
     print("  ── Evaluation ──\n")
 
-    r = bench(f"fib({fib_n}) Nat/Peano", bench_fib_nat(fib_n), runs=runs)
+    run_eval, run_convert = bench_fib_nat(fib_n)
+    r = bench(f"fib({fib_n}) Nat/Peano", run_eval, runs=runs)
+    results.append(r); print(fmt_bench(r))
+    r = bench(f"fib({fib_n}) Nat → int", run_convert, runs=runs, setup=run_eval)
     results.append(r); print(fmt_bench(r))
     if "result" in r:
         print(f"    → result: {r['result']}")
@@ -260,7 +299,10 @@ def run_benchmarks(quick=False):
     if "result" in r:
         print(f"    → result: {r['result']}")
 
-    r = bench(f"fact({fact_n}) Nat/Peano", bench_fact_nat(fact_n), runs=runs)
+    run_eval, run_convert = bench_fact_nat(fact_n)
+    r = bench(f"fact({fact_n}) Nat/Peano", run_eval, runs=runs)
+    results.append(r); print(fmt_bench(r))
+    r = bench(f"fact({fact_n}) Nat → int", run_convert, runs=runs, setup=run_eval)
     results.append(r); print(fmt_bench(r))
     if "result" in r:
         print(f"    → result: {r['result']}")
@@ -287,11 +329,13 @@ def run_benchmarks(quick=False):
         }
         in add (fact (Succ (Succ (Succ (Succ (Succ Zero)))))) (fib (Succ (Succ (Succ (Succ (Succ (Succ Zero)))))))
     """
+    # Compiled once and shared by every bench below; none of them mutate it.
+    big_graph = C.compile_expr(big_src)
 
     r = bench("parse large program", bench_compile(big_src), runs=runs)
     results.append(r); print(fmt_bench(r))
 
-    r = bench("optimize large program", bench_optimize_pipeline(big_src), runs=runs)
+    r = bench("optimize large program", bench_optimize_pipeline(big_graph), runs=runs)
     results.append(r); print(fmt_bench(r))
 
     r = bench("typecheck λx. x + 1", bench_typecheck("λx. x + 1"), runs=runs)
@@ -303,30 +347,29 @@ def run_benchmarks(quick=False):
     # ── Serialization benchmarks ──
     print("\n  ── Serialization ──\n")
 
-    r = bench("serialize roundtrip", bench_serialize_roundtrip(big_src), runs=runs)
+    r = bench("serialize roundtrip", bench_serialize_roundtrip(big_graph), runs=runs)
     results.append(r); print(fmt_bench(r))
 
-    r = bench("XiC compress roundtrip", bench_xic_roundtrip(big_src), runs=runs)
+    r = bench("XiC compress roundtrip", bench_xic_roundtrip(big_graph), runs=runs)
     results.append(r); print(fmt_bench(r))
 
     # ── Size comparison ──
     print("\n  ── Binary sizes ──\n")
-    graph = C.compile_expr(big_src)
-    xi_size = len(serialize(graph))
-    opt_graph, stats = optimize(graph)
+    xi_size = len(serialize(big_graph))
+    opt_graph, stats = optimize(big_graph)
     opt_size = len(serialize(opt_graph))
     xic_size = len(compress(opt_graph))
     print(f"  {'Program':30s}  {'Xi':>8s}  {'Optimized':>10s}  {'XiC':>8s}")
     print(f"  {'─'*30}  {'─'*8}  {'─'*10}  {'─'*8}")
     print(f"  {'fact+fib (large)':30s}  {xi_size:>7d}B  {opt_size:>9d}B  {xic_size:>7d}B")
 
-    for name, src in [
+    small_graphs = {name: C.compile_expr(src) for name, src in [
         ("42", "42"),
         ("2+3", "2 + 3"),
         ("λx. x*x", "λ(x:Int). x * x"),
         ("fib def", "fix self. λn. match n { Zero → Zero | Succ k → match k { Zero → Succ Zero | Succ j → Succ Zero } }"),
-    ]:
-        g = C.compile_expr(src)
+    ]}
+    for name, g in small_graphs.items():
         xs = len(serialize(g))
         og, _ = optimize(g)
         os_ = len(serialize(og))
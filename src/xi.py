@@ -99,7 +99,7 @@ FORMAT_VERSION = 0x01
 # GRAPH NODE
 # ═══════════════════════════════════════════════════════════════
 
-@dataclass
+@dataclass(slots=True)
 class Node:
     """A node in the Xi program graph."""
     tag: Tag
@@ -138,6 +138,51 @@ class Node:
         return self.content_hash().hex()[:16]
 
 
+# Interpreter side tables of free-index bounds are dropped at this size
+_BOUND_CACHE_LIMIT = 1 << 20
+
+
+def _children_bound(node: Node, bounds: dict) -> int:
+    """Free-index bound of a non-variable node from its children's bounds."""
+    bound = 0
+    binder = node.tag == Tag.LAM or node.tag == Tag.FIX
+    for i, child in enumerate(node.children):
+        b = bounds[id(child)]
+        if binder and i == 1:
+            b -= 1
+        if b > bound:
+            bound = b
+    return bound
+
+
+def _free_bound(node: Node, bounds: dict, pinned: list) -> int:
+    """One more than the largest free de Bruijn index in node (0 if closed).
+
+    bounds maps id(n) → bound for every node visited, so later calls on
+    the same graph are O(1); pinned keeps those nodes alive so their ids
+    are not reused while the entries stand. Binders follow
+    Interpreter._substitute: child 1 of LAM and FIX.
+    """
+    b = bounds.get(id(node))
+    if b is not None:
+        return b
+    stack = [(node, False)]
+    while stack:
+        n, expanded = stack.pop()
+        if id(n) in bounds:
+            continue
+        if n.tag == Tag.PRIM and n.prim_op == PrimOp.VAR:
+            bounds[id(n)] = n.data + 1 if isinstance(n.data, int) else 0
+            pinned.append(n)
+        elif expanded:
+            bounds[id(n)] = _children_bound(n, bounds)
+            pinned.append(n)
+        else:
+            stack.append((n, True))
+            stack.extend((c, False) for c in n.children if id(c) not in bounds)
+    return bounds[id(node)]
+
+
 # ═══════════════════════════════════════════════════════════════
 # BUILDER — High-level graph construction
 # ═══════════════════════════════════════════════════════════════
@@ -251,13 +296,20 @@ def serialize(root: Node) -> bytes:
     return bytes(result)
 
 
+# Byte (as a latin-1 char) → its hexdump ASCII column char
+_HEXDUMP_ASCII = {b: '·' for b in range(256) if not 32 <= b < 127}
+
+
 def hexdump(data: bytes, width: int = 16) -> str:
     """Format binary data as a hex dump string."""
+    # Hex and ASCII columns are built by bytes.hex / str.translate, not
+    # a per-byte Python loop
+    view = memoryview(data)
     lines = []
     for i in range(0, len(data), width):
-        chunk = data[i:i + width]
-        hex_part = ' '.join(f'{b:02X}' for b in chunk)
-        ascii_part = ''.join(chr(b) if 32 <= b < 127 else '·' for b in chunk)
+        chunk = view[i:i + width]
+        hex_part = chunk.hex(' ').upper()
+        ascii_part = str(chunk, 'latin-1').translate(_HEXDUMP_ASCII)
         lines.append(f"  {i:04X}  {hex_part:<{width * 3}}  {ascii_part}")
     return '\n'.join(lines)
 
@@ -275,11 +327,23 @@ class Interpreter:
 
     def __init__(self):
         self.reductions = 0
+        self._bounds = {}    # id(node) → free-index bound, for _substitute
+        self._pinned = []    # the nodes _bounds has entries for
+        self._closed = False  # running a closed graph (see run)
 
     def run(self, node: Node) -> Any:
         """Reduce a Xi graph to a value."""
         self.reductions = 0
-        return self._eval(node)
+        # Bounds are only trusted within one run: callers may edit nodes
+        # in place between runs
+        self._bounds.clear()
+        self._pinned.clear()
+        # Reducing a closed graph only ever substitutes closed values
+        self._closed = _free_bound(node, self._bounds, self._pinned) == 0
+        try:
+            return self._eval(node)
+        finally:
+            self._closed = False
 
     def _eval(self, n: Node) -> Any:
         self.reductions += 1
@@ -375,27 +439,70 @@ class Interpreter:
         raise XiError(f"Unknown binary op: {PRIM_NAME.get(op, '?')}")
 
     def _substitute(self, node: Node, idx: int, val: Node) -> Node:
-        """Substitute de Bruijn index `idx` with `val` in `node`."""
-        if node.tag == Tag.PRIM and node.prim_op == PrimOp.VAR:
-            if node.data == idx:
-                return val
-            elif node.data > idx:
-                return Node(Tag.PRIM, prim_op=PrimOp.VAR, data=node.data - 1)
+        """Substitute de Bruijn index `idx` with `val` in `node`.
+
+        Subtrees with no free index >= idx are returned as they are, and
+        the walk uses an explicit stack, so deep bodies need no recursion.
+        """
+        bounds, pinned = self._bounds, self._pinned
+        if len(bounds) > _BOUND_CACHE_LIMIT:
+            bounds.clear()
+            pinned.clear()
+        if _free_bound(node, bounds, pinned) <= idx:
             return node
-
-        # Under binders, shift the index
-        new_children = []
-        for i, child in enumerate(node.children):
-            if node.tag in (Tag.LAM, Tag.FIX) and i == 1:
-                new_children.append(self._substitute(child, idx + 1, val))
-            else:
-                new_children.append(self._substitute(child, idx, val))
-
-        return Node(
-            tag=node.tag, children=new_children,
-            prim_op=node.prim_op, data=node.data,
-            effect=node.effect, universe_level=node.universe_level,
-        )
+        # Rebuilt parents read val's bound. Values built at run time
+        # (constructor chains) are fresh each time, so only walk them when
+        # they may be open
+        if not self._closed:
+            _free_bound(val, bounds, pinned)
+        elif id(val) not in bounds:
+            bounds[id(val)] = 0
+            pinned.append(val)
+
+        done = {}      # (id(node), idx) → result, so shared subtrees are rewritten once
+        results = []
+        stack = [(node, idx, False)]
+        while stack:
+            n, k, expanded = stack.pop()
+            key = (id(n), k)
+            if not expanded:
+                if key in done:
+                    results.append(done[key])
+                    continue
+                if bounds[id(n)] <= k:
+                    results.append(n)
+                    continue
+                if n.tag == Tag.PRIM and n.prim_op == PrimOp.VAR:
+                    if n.data == k:
+                        r = val
+                    else:  # n.data > k: a variable bound outside the redex
+                        r = Node(Tag.PRIM, prim_op=PrimOp.VAR, data=n.data - 1)
+                        bounds[id(r)] = n.data
+                        pinned.append(r)
+                    done[key] = r
+                    results.append(r)
+                    continue
+                # Under binders, shift the index
+                stack.append((n, k, True))
+                shift = n.tag in (Tag.LAM, Tag.FIX)
+                for i in range(len(n.children) - 1, -1, -1):
+                    stack.append((n.children[i], k + 1 if shift and i == 1 else k, False))
+                continue
+
+            arity = len(n.children)
+            new_children = results[len(results) - arity:]
+            del results[len(results) - arity:]
+            r = Node(
+                tag=n.tag, children=new_children,
+                prim_op=n.prim_op, data=n.data,
+                effect=n.effect, universe_level=n.universe_level,
+            )
+            bounds[id(r)] = _children_bound(r, bounds)
+            pinned.append(r)
+            done[key] = r
+            results.append(r)
+
+        return results[0]
 
     def _to_node(self, value: Any) -> Node:
         if isinstance(value, Node):
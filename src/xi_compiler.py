@@ -384,6 +384,8 @@ class Parser:
         self.pos = 0
         self.scope = Scope()
         self.definitions = {}
+        self.def_refs = {}      # def name → names of the defs its body uses
+        self._refs = None       # def_refs entry of the def being parsed
         self.constructors = dict(KNOWN_CONSTRUCTORS)  # local copy
         self.type_registry = dict(TYPE_REGISTRY)
         self.source_lines = None  # set by Compiler for error display
@@ -471,7 +473,11 @@ class Parser:
         saved = self.scope
         for p in params:
             self.scope = self.scope.bind(p)
-        body = self.parse_expr()
+        self._refs = self.def_refs.setdefault(name, set())
+        try:
+            body = self.parse_expr()
+        finally:
+            self._refs = None
         self.scope = saved
         # Wrap in lambdas
         for p in reversed(params):
@@ -720,9 +726,16 @@ class Parser:
         if tok.kind == TK.IDENT:
             self.advance(); name = tok.value
             if name in BUILTINS: return BUILTINS[name]()
-            if name in self.definitions: return self.definitions[name]
+            if name in self.definitions:
+                if self._refs is not None: self._refs.add(name)
+                return self.definitions[name]
             idx = self.scope.resolve(name)
             if idx is not None: return B.var(idx)
+            if name == "nat_of_int":
+                # Compile-time intrinsic: `nat_of_int 3` lowers straight to
+                # Succ (Succ (Succ Zero)) without going through the parser.
+                if not self.at(TK.INT): self.error("nat_of_int expects an integer literal")
+                return nat(self.advance().value)
             raise ParseError(f"Undefined variable '{name}'", tok.span)
         return None
 
@@ -751,6 +764,16 @@ class Compiler:
         p = self._make_parser(tokens)
         return p.parse_program()
 
+    def compile_program_refs(self, source, filename="<input>"):
+        """Like compile_program, but returns (definitions, def_refs).
+
+        def_refs maps each def declared in source to the names of the defs
+        its body refers to.
+        """
+        tokens = tokenize(source, filename)
+        p = self._make_parser(tokens)
+        return p.parse_program(), p.def_refs
+
     def compile(self, source, filename="<input>"):
         """Backwards-compatible: returns (Node, bytes)."""
         graph = self.compile_expr(source, filename)
@@ -8,15 +8,19 @@ compression over the standard Xi binary format through three techniques:
 
   1. Variable-length integer encoding (LEB128) instead of fixed 2/8 bytes
   2. Structural deduplication via content-addressed node hashing (CSE)
-  3. zlib compression of the payload
+  3. zstd (if installed) or dictionary-primed zlib compression of the payload
 
 Format:
-  Header (8 bytes):
+  Header (7+ bytes):
     [CE 9E 43]     Magic: "ΞC" (Xi Compressed)
-    [01]           XiC version
-    [xx xx]        Original (uncompressed payload) size
-    [xx xx]        Compressed payload size
-  Payload (zlib-compressed):
+    [03]           XiC version
+    [xx]           Payload codec: 0 = stored, 1 = zlib, 2 = zstd,
+                   3 = raw deflate primed with XI_ZDICT
+    [varint]       Original (uncompressed payload) size
+    [varint]       Compressed payload size
+  Versions 01 and 02 used 2-byte big-endian sizes (payloads < 64 KiB); v01
+  also has no codec byte and is always zlib. Both still decode.
+  Payload (after decoding):
     [node_count: varint]
     [root_index: varint]
     For each node:
@@ -40,36 +44,92 @@ from xi import (
     Node, Tag, PrimOp, Effect, B, MAGIC as XI_MAGIC, FORMAT_VERSION,
     serialize, Interpreter, XiError, render_tree,
 )
+from xi_match import MatchInterpreter
+
+try:
+    import zstandard
+except ImportError:  # optional: fall back to zlib
+    zstandard = None
 
 # ═══════════════════════════════════════════════════════════════
 # CONSTANTS
 # ═══════════════════════════════════════════════════════════════
 
 XIC_MAGIC = b'\xCE\x9E\x43'   # "ΞC"
-XIC_VERSION = 0x01
+XIC_VERSION = 0x03
+
+# Payload codecs (header byte 4)
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_ZLIB_DICT = 3
+
+_XIC_SIZES_16 = struct.Struct('>HH')   # v1/v2 fixed-width size fields
+
+ZSTD_LEVEL = 15
+RAW_THRESHOLD = 64   # zstd payloads shorter than this are stored instead
+
+# Preset zlib dictionary: the XiC payloads of the lib/Prelude.xi-src
+# definitions, smallest first. Short programs reuse these tag/arity, child-ref
+# and PrimOp byte runs instead of emitting literals. Frozen — changing it
+# makes existing CODEC_ZLIB_DICT files undecodable. The stream is raw deflate
+# (no zlib wrapper); the header's size field already checks the result.
+XI_ZDICT = bytes.fromhex(
+    "0302400090000002000104034000900001020001020002060540009000019000"
+    "0012010202000302000409084000906002900000120102906100120304020002"
+    "1205060200070908400090000290000190000012020312010402000502000602"
+    "0007090840009000029000001201029000011203040200050200060200070a09"
+    "40009060029000001201029061001203049061010200061205070200080a0940"
+    "009060029000001201029000011203040200021205060200070200080c0b4000"
+    "906002902190000112020390000012040512010612070312080502000902000a"
+    "0c0b400090600290229000011202039000001204051201061207031208050200"
+    "0902000a0d0c4000906002902190000012020390030012040512010690151208"
+    "03120709120a0302000b0e0d4000906002900000120102906100120304906101"
+    "90000212070212060802000912050a02000b02000c100f400090600290000112"
+    "010290000012030490610190000312070412080212060902000a12050b02000c"
+    "02000d52000e1918400090600290000112010290610012030490000012030690"
+    "6101900003120906120a0212080b02000c12070d02000e02000f52001012110b"
+    "1212020200131205140200150200165200171f1e400090600290000012010290"
+    "6100120304906101120604120307900001120109120a02900003120c02120d09"
+    "12060e02000f120b10020011020012520013120602120c1512141612170d0200"
+    "1812081902001a12051b02001c52001d25244000906002900000120102906101"
+    "906100120405120306900001120108120905120902900003120c02120d081204"
+    "0e02000f120b1002001102001252001312140e121508020016120a1702001802"
+    "001952001a120402121b1c900002121e02121d1f020020120721020022520023"
+)
+_ZLIB_DICT_BASE = zlib.compressobj(9, zlib.DEFLATED, -15, 8,
+                                   zlib.Z_DEFAULT_STRATEGY, zdict=XI_ZDICT)
 
 
 # ═══════════════════════════════════════════════════════════════
 # LEB128 VARIABLE-LENGTH INTEGERS
 # ═══════════════════════════════════════════════════════════════
 
-def _encode_varint(value):
-    """Encode unsigned integer as LEB128."""
-    buf = bytearray()
+def _encode_varint(value, out):
+    """Append unsigned integer as LEB128 to the bytearray out."""
+    # Child indices and lengths almost always fit in one or two bytes.
+    if value < 0x80:
+        out.append(value)
+        return
+    if value < 0x4000:
+        out.append((value & 0x7F) | 0x80)
+        out.append(value >> 7)
+        return
     while True:
         byte = value & 0x7F
         value >>= 7
         if value:
-            buf.append(byte | 0x80)
+            out.append(byte | 0x80)
         else:
-            buf.append(byte)
+            out.append(byte)
             break
-    return bytes(buf)
 
 
-def _encode_signed_varint(value):
-    """Encode signed integer as signed LEB128."""
-    buf = bytearray()
+def _encode_signed_varint(value, out):
+    """Append signed integer as signed LEB128 to the bytearray out."""
+    if -0x40 <= value < 0x40:
+        out.append(value & 0x7F)
+        return
     more = True
     while more:
         byte = value & 0x7F
@@ -78,12 +138,13 @@ def _encode_signed_varint(value):
             more = False
         else:
             byte |= 0x80
-        buf.append(byte)
-    return bytes(buf)
+        out.append(byte)
 
 
 def _decode_varint(data, pos):
     """Decode unsigned LEB128 from data at pos. Returns (value, new_pos)."""
+    if pos < len(data) and data[pos] < 0x80:
+        return data[pos], pos + 1
     result = 0
     shift = 0
     while True:
@@ -100,6 +161,9 @@ def _decode_varint(data, pos):
 
 def _decode_signed_varint(data, pos):
     """Decode signed LEB128 from data at pos. Returns (value, new_pos)."""
+    if pos < len(data) and data[pos] < 0x80:
+        byte = data[pos]
+        return (byte - 0x80 if byte & 0x40 else byte), pos + 1
     result = 0
     shift = 0
     byte = 0
@@ -112,8 +176,8 @@ def _decode_signed_varint(data, pos):
         shift += 7
         if (byte & 0x80) == 0:
             break
-    # Sign extend
-    if shift < 64 and (byte & 0x40):
+    # Sign extend (Python ints are unbounded, so no 64-bit cap)
+    if byte & 0x40:
         result |= -(1 << shift)
     return result, pos
 
@@ -122,64 +186,112 @@ def _decode_signed_varint(data, pos):
 # STRUCTURAL DEDUPLICATION
 # ═══════════════════════════════════════════════════════════════
 
-def _structural_hash(node, child_hashes):
-    """Compute a structural identity for CSE dedup."""
-    parts = [node.tag.to_bytes(1, 'big')]
-    if node.tag == Tag.PRIM and node.prim_op is not None:
-        parts.append(node.prim_op.to_bytes(1, 'big'))
-        if node.data is not None:
-            if isinstance(node.data, str):
-                parts.append(node.data.encode('utf-8'))
-            elif isinstance(node.data, int):
-                parts.append(node.data.to_bytes(8, 'big', signed=True))
-            elif isinstance(node.data, float):
-                parts.append(struct.pack('>d', node.data))
-    if node.tag == Tag.UNI:
-        parts.append(node.universe_level.to_bytes(2, 'big'))
-    if node.tag == Tag.EFF:
-        parts.append(node.effect.to_bytes(1, 'big'))
-    for h in child_hashes:
-        parts.append(h)
-    return b'|'.join(parts)
+_pack_double = struct.Struct('>d').pack
 
 
 def _dedup_collect(root):
     """
-    Collect unique nodes via structural hashing.
-    Returns (ordered_nodes, index_of_root) with shared subtrees deduplicated.
+    Collect unique nodes via hash-consing.
+
+    Children are deduplicated first, so a node's structural identity is its
+    own fields plus the tuple of its children's indices; that tuple is the
+    dict key, with no recursive digest. Fields the encoder does not write
+    (data without a prim_op, non-int/str/float data) are left out of the key.
+    Returns (ordered_nodes, index_of_root, id_to_idx).
     """
     nodes = []
-    node_hash = {}     # id(node) → structural hash bytes
-    hash_to_idx = {}   # structural hash → index in nodes[]
+    key_to_idx = {}    # structural key → index in nodes[]
     id_to_idx = {}     # id(node) → index in nodes[]
-    visited = set()
 
-    def visit(node):
-        nid = id(node)
-        if nid in visited:
-            return
-        visited.add(nid)
-
-        for child in node.children:
-            visit(child)
-
-        child_hashes = [node_hash[id(c)] for c in node.children]
-        sh = _structural_hash(node, child_hashes)
-        node_hash[nid] = sh
-
-        if sh in hash_to_idx:
-            id_to_idx[nid] = hash_to_idx[sh]
+    # Iterative post-order: (node, False) expands children left to right,
+    # (node, True) assigns the node once all of its children are done.
+    stack = [(root, False)]
+
+    # Hot-loop locals
+    _id, _tuple, _type = id, tuple, type
+    _push, _pop = stack.append, stack.pop
+    _append = nodes.append
+    _key_idx = key_to_idx.get
+    PRIM, UNI, EFF = Tag.PRIM, Tag.UNI, Tag.EFF
+
+    while stack:
+        node, ready = _pop()
+        nid = _id(node)
+        if nid in id_to_idx:
+            continue
+        if not ready:
+            _push((node, True))
+            for child in reversed(node.children):
+                _push((child, False))
+            continue
+
+        child_idxs = _tuple([id_to_idx[_id(c)] for c in node.children])
+        tag = node.tag
+        if tag == PRIM:
+            op = node.prim_op
+            data = node.data if op is not None else None
+            cls = _type(data)
+            if cls is float:
+                data = _pack_double(data)   # keeps 0.0 and -0.0 apart
+            elif cls is not int and cls is not str and cls is not bool:
+                data = cls = None
+            key = (tag, child_idxs, op, cls, data)
+        elif tag == UNI:
+            key = (tag, child_idxs, node.universe_level)
+        elif tag == EFF:
+            key = (tag, child_idxs, node.effect)
         else:
-            idx = len(nodes)
-            nodes.append(node)
-            hash_to_idx[sh] = idx
-            id_to_idx[nid] = idx
+            key = (tag, child_idxs)
+
+        idx = _key_idx(key)
+        if idx is None:
+            idx = key_to_idx[key] = len(nodes)
+            _append(node)
+        id_to_idx[nid] = idx
 
-    visit(root)
     root_idx = id_to_idx[id(root)]
     return nodes, root_idx, id_to_idx
 
 
+# ═══════════════════════════════════════════════════════════════
+# PAYLOAD CODECS
+# ═══════════════════════════════════════════════════════════════
+
+def _pack_payload(payload):
+    """Compress payload with the best available codec. Returns (codec, body).
+
+    Any payload the codec fails to shrink is stored.
+    """
+    if zstandard is not None:
+        if len(payload) < RAW_THRESHOLD:
+            return CODEC_RAW, payload
+        codec = CODEC_ZSTD
+        body = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    else:
+        # Copying the primed deflate state skips re-loading the dictionary
+        codec = CODEC_ZLIB_DICT
+        co = _ZLIB_DICT_BASE.copy()
+        body = co.compress(payload) + co.flush()
+    if len(body) >= len(payload):
+        return CODEC_RAW, payload
+    return codec, body
+
+
+def _unpack_payload(codec, body):
+    """Inverse of _pack_payload."""
+    if codec == CODEC_RAW:
+        return bytes(body)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(body)
+    if codec == CODEC_ZLIB_DICT:
+        return zlib.decompressobj(-15, zdict=XI_ZDICT).decompress(body)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise XiError("XiC payload is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise XiError(f"Unknown XiC codec: {codec}")
+
+
 # ═══════════════════════════════════════════════════════════════
 # COMPRESS
 # ═══════════════════════════════════════════════════════════════
@@ -191,7 +303,7 @@ def compress(root):
     Pipeline:
       1. Structural dedup (CSE) to minimize node count
       2. Encode to compact payload with LEB128 varints
-      3. zlib compress the payload
+      3. Compress the payload (zstd, zlib, or stored; see _pack_payload)
 
     Returns: XiC bytes
     """
@@ -199,77 +311,98 @@ def compress(root):
 
     # Encode payload
     payload = bytearray()
-    payload += _encode_varint(len(nodes))
-    payload += _encode_varint(root_idx)
+    _encode_varint(len(nodes), payload)
+    _encode_varint(root_idx, payload)
+
+    # Hot-loop locals. Fields are written with bound appends: measured
+    # faster than struct.pack_into on a preallocated buffer, since CPython
+    # bytearray growth is amortized and every field here is a byte or varint.
+    _append, _extend = payload.append, payload.extend
+    _id, _id2i = id, id_to_idx
+    _varint = _encode_varint
+    PRIM, UNI, EFF = Tag.PRIM, Tag.UNI, Tag.EFF
+    INT_LIT = PrimOp.INT_LIT
 
     for node in nodes:
+        tag, children = node.tag, node.children
         # Header byte: [TTTT AAAA]
-        payload.append((node.tag << 4) | (node.arity & 0x0F))
+        _append((tag << 4) | (len(children) & 0x0F))
 
         # Child references as varints
-        for child in node.children:
-            child_idx = id_to_idx[id(child)]
-            payload += _encode_varint(child_idx)
+        for child in children:
+            _varint(_id2i[_id(child)], payload)
 
         # Tag-specific data
-        if node.tag == Tag.PRIM and node.prim_op is not None:
-            payload.append(node.prim_op & 0xFF)
-            if node.data is not None:
-                if isinstance(node.data, str):
-                    enc = node.data.encode('utf-8')
-                    payload += _encode_varint(len(enc))
-                    payload += enc
-                elif isinstance(node.data, int) and node.prim_op == PrimOp.INT_LIT:
-                    payload += _encode_signed_varint(node.data)
-                elif isinstance(node.data, float):
-                    payload += struct.pack('>d', node.data)
-                elif isinstance(node.data, int) and node.prim_op == PrimOp.VAR:
-                    payload += _encode_varint(node.data)
-                elif isinstance(node.data, int):
-                    # Generic int data (e.g. constructor index)
-                    payload += _encode_varint(node.data)
-
-        if node.tag == Tag.UNI:
-            payload += _encode_varint(node.universe_level)
-
-        if node.tag == Tag.EFF:
-            payload.append(node.effect & 0xFF)
+        if tag == PRIM:
+            op, data = node.prim_op, node.data
+            if op is not None:
+                _append(op & 0xFF)
+                if data is None:
+                    pass
+                elif isinstance(data, str):
+                    enc = data.encode('utf-8')
+                    _varint(len(enc), payload)
+                    _extend(enc)
+                elif isinstance(data, float):
+                    _extend(struct.pack('>d', data))
+                elif isinstance(data, int):
+                    if op == INT_LIT:
+                        _encode_signed_varint(data, payload)
+                    else:
+                        # VAR index or generic int data (e.g. constructor index)
+                        _varint(data, payload)
+
+        elif tag == UNI:
+            _varint(node.universe_level, payload)
+
+        elif tag == EFF:
+            _append(node.effect & 0xFF)
 
     payload = bytes(payload)
-    compressed = zlib.compress(payload, 9)
-
-    # Header
-    result = bytearray()
-    result += XIC_MAGIC
-    result += bytes([XIC_VERSION])
-    result += len(payload).to_bytes(2, 'big')
-    result += len(compressed).to_bytes(2, 'big')
-    result += compressed
+    codec, compressed = _pack_payload(payload)
 
-    return bytes(result)
+    header = bytearray(XIC_MAGIC)
+    header.append(XIC_VERSION)
+    header.append(codec)
+    _encode_varint(len(payload), header)
+    _encode_varint(len(compressed), header)
+    return b''.join((header, compressed))
 
 
 # ═══════════════════════════════════════════════════════════════
 # DECOMPRESS
 # ═══════════════════════════════════════════════════════════════
 
+def _parse_header(data):
+    """Split XiC bytes into (codec, original payload size, compressed body)."""
+    if len(data) < 8:
+        raise XiError(f"XiC too short ({len(data)} bytes)")
+    if data[:3] != XIC_MAGIC:
+        raise XiError(f"Invalid XiC magic: {data[:3].hex()}")
+    version = data[3]
+    if version == XIC_VERSION:
+        codec = data[4]
+        orig_size, pos = _decode_varint(data, 5)
+        comp_size, pos = _decode_varint(data, pos)
+    elif version == 0x02:
+        codec, pos = data[4], 9
+        orig_size, comp_size = _XIC_SIZES_16.unpack_from(data, 5)
+    elif version == 0x01:
+        codec, pos = CODEC_ZLIB, 8   # v1: no codec byte, always zlib
+        orig_size, comp_size = _XIC_SIZES_16.unpack_from(data, 4)
+    else:
+        raise XiError(f"Unsupported XiC version: {version}")
+    return codec, orig_size, data[pos:pos + comp_size]
+
+
 def decompress(data):
     """
     Decompress XiC/0.1 bytes back to a Xi graph.
 
     Returns: root Node
     """
-    if len(data) < 7:
-        raise XiError(f"XiC too short ({len(data)} bytes)")
-    if data[:3] != XIC_MAGIC:
-        raise XiError(f"Invalid XiC magic: {data[:3].hex()}")
-    if data[3] != XIC_VERSION:
-        raise XiError(f"Unsupported XiC version: {data[3]}")
-
-    orig_size = int.from_bytes(data[4:6], 'big')
-    comp_size = int.from_bytes(data[6:8], 'big')
-
-    payload = zlib.decompress(data[8:8 + comp_size])
+    codec, orig_size, body = _parse_header(data)
+    payload = _unpack_payload(codec, body)
     if len(payload) != orig_size:
         raise XiError(f"Size mismatch: expected {orig_size}, got {len(payload)}")
 
@@ -278,8 +411,18 @@ def decompress(data):
     root_idx, pos = _decode_varint(payload, pos)
 
     nodes = []
+
+    # Hot-loop locals
+    end = len(payload)
+    _append, _Node = nodes.append, Node
+    _varint, _svarint = _decode_varint, _decode_signed_varint
+    PRIM, UNI, EFF = Tag.PRIM, Tag.UNI, Tag.EFF
+    INT_LIT, STR_LIT, FLOAT_LIT, VAR = (
+        PrimOp.INT_LIT, PrimOp.STR_LIT, PrimOp.FLOAT_LIT, PrimOp.VAR)
+    PURE = Effect.PURE
+
     for i in range(node_count):
-        if pos >= len(payload):
+        if pos >= end:
             raise XiError(f"Unexpected EOF at node {i}")
 
         header = payload[pos]
@@ -287,47 +430,58 @@ def decompress(data):
         tag = (header >> 4) & 0x0F
         arity = header & 0x0F
 
-        # Read child indices
-        child_indices = []
-        for _ in range(arity):
-            idx, pos = _decode_varint(payload, pos)
-            child_indices.append(idx)
-
-        children = [nodes[ci] for ci in child_indices]
+        # Child refs. Usually every ref fits in one byte, and then the whole
+        # run is decoded with a single slice; arity 1 and 2 (APP, LAM, ...)
+        # are unrolled.
+        if not arity:
+            children = []
+        else:
+            run = payload[pos:pos + arity]
+            if len(run) == arity and max(run) < 0x80:
+                pos += arity
+                if arity == 2:
+                    children = [nodes[run[0]], nodes[run[1]]]
+                elif arity == 1:
+                    children = [nodes[run[0]]]
+                else:
+                    children = [nodes[ci] for ci in run]
+            else:
+                children = []
+                for _ in range(arity):
+                    idx, pos = _varint(payload, pos)
+                    children.append(nodes[idx])
 
         prim_op = None
         node_data = None
         universe_level = 0
-        effect = Effect.PURE
+        effect = PURE
 
-        if tag == Tag.PRIM:
+        if tag == PRIM:
             prim_op = payload[pos]
             pos += 1
-            if prim_op == PrimOp.INT_LIT:
-                node_data, pos = _decode_signed_varint(payload, pos)
-            elif prim_op == PrimOp.STR_LIT:
-                slen, pos = _decode_varint(payload, pos)
+            if prim_op == INT_LIT:
+                node_data, pos = _svarint(payload, pos)
+            elif prim_op == VAR:
+                node_data, pos = _varint(payload, pos)
+            elif prim_op == STR_LIT:
+                slen, pos = _varint(payload, pos)
                 node_data = payload[pos:pos + slen].decode('utf-8')
                 pos += slen
-            elif prim_op == PrimOp.FLOAT_LIT:
+            elif prim_op == FLOAT_LIT:
                 node_data = struct.unpack('>d', payload[pos:pos + 8])[0]
                 pos += 8
-            elif prim_op == PrimOp.VAR:
-                node_data, pos = _decode_varint(payload, pos)
             elif prim_op >= 0x60:
                 # Extended prims (CONSTR=0x61, MATCH=0x60) — read data
-                node_data, pos = _decode_varint(payload, pos)
+                node_data, pos = _varint(payload, pos)
 
-        if tag == Tag.UNI:
-            universe_level, pos = _decode_varint(payload, pos)
+        elif tag == UNI:
+            universe_level, pos = _varint(payload, pos)
 
-        if tag == Tag.EFF:
+        elif tag == EFF:
             effect = payload[pos]
             pos += 1
 
-        node = Node(tag, children=children, prim_op=prim_op, data=node_data,
-                    effect=effect, universe_level=universe_level)
-        nodes.append(node)
+        _append(_Node(tag, children, prim_op, node_data, effect, universe_level))
 
     if root_idx >= len(nodes):
         raise XiError(f"Root index {root_idx} out of range")
@@ -367,6 +521,7 @@ def run_demo():
     passed = 0
     failed = 0
     interp = Interpreter()
+    match_interp = MatchInterpreter()
 
     def check(name, expected, actual):
         nonlocal passed, failed
@@ -438,8 +593,7 @@ def run_demo():
         print(f"  {name:24s}  Xi: {xi_size:5d} B → XiC: {xic_size:5d} B  ({ratio:5.1f}% reduction)")
         # Verify roundtrip
         result_orig = interp.run(prog)
-        from xi_match import MatchInterpreter
-        result_rt = MatchInterpreter().run(decompress(compress(prog)))
+        result_rt = match_interp.run(decompress(compress(prog)))
         if result_orig == result_rt:
             passed += 1
         else:
@@ -8,7 +8,9 @@ Generates structured training data for AI learning:
   - Multiple difficulty levels
 """
 
-import json, os, hashlib, base64, random
+import json, os, re, hashlib, base64, random
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 from xi import Node, Tag, PrimOp, serialize
 from xi_compiler import Compiler
 from xi_match import MatchInterpreter, Constructor, nat_to_int
@@ -16,6 +18,21 @@ from xi_json import to_json, hash_node, diff, diff_stats, analyze_properties, no
 from xi_optimizer import optimize
 from xi_sandbox import SandboxedInterpreter, SandboxConfig
 
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
+
+def _write_json(path, obj):
+    """Write obj to path as indented JSON, using orjson when it is installed."""
+    if orjson is not None:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2, default=str)
+    else:
+        data = json.dumps(obj, indent=2, default=str).encode()
+    with open(path, 'wb') as f:
+        f.write(data)
+
 
 # ═══════════════════════════════════════════
 # PROGRAM TEMPLATES
@@ -76,161 +93,238 @@ MUTATIONS = [
 ]
 
 
-def generate_dataset(n=100, output_dir="dataset"):
-    """Generate n training examples with JSON metadata."""
-    os.makedirs(output_dir, exist_ok=True)
-    os.makedirs(os.path.join(output_dir, "examples"), exist_ok=True)
-    os.makedirs(os.path.join(output_dir, "mutations"), exist_ok=True)
+_PLACEHOLDER = re.compile(r"\{(a|b|c|d|s1|s2)\}")
 
-    c = Compiler()
-    sandbox = SandboxedInterpreter(SandboxConfig.strict())
-    manifest = {"version": "xi-dataset-v1", "count": 0, "examples": [], "mutations": []}
-    generated = 0
-
-    # Generate examples
-    for i in range(n):
-        category = random.choice(list(TEMPLATES.keys()))
-        templates = TEMPLATES[category]
-        template_expr, compute_fn = random.choice(templates)
-
-        # Generate random parameters
-        params = _random_params(template_expr)
-        try:
-            if category == "string":
-                words = ["hello", "world", "xi", "lang", "ai", "code", "test"]
-                params = {"s1": random.choice(words), "s2": random.choice(words)}
-            source_expr = template_expr.format(**params)
-        except:
-            continue
-
-        # Build full source
-        if "def " in source_expr:
-            source = source_expr
+
+class Template:
+    """A source template compiled once to a %-style format string.
+
+    Only the {a}..{d}, {s1}, {s2} placeholders are substituted, so literal
+    braces (match branches) need no escaping. render(params) is a single
+    % operation instead of re-parsing a str.format template every call.
+    """
+    __slots__ = ("source", "keys", "_fmt")
+
+    def __init__(self, source):
+        self.source = source
+        self.keys = tuple(dict.fromkeys(_PLACEHOLDER.findall(source)))
+        self._fmt = _PLACEHOLDER.sub(r"%(\1)s", source.replace("%", "%%"))
+
+    def render(self, params):
+        return self._fmt % params
+
+
+_COMPILED_TEMPLATES = {
+    category: [(Template(t), fn) for t, fn in templates]
+    for category, templates in TEMPLATES.items()
+}
+_COMPILED_MUTATIONS = [(desc, Template(o), Template(m)) for desc, o, m in MUTATIONS]
+
+
+_worker_compiler = None
+_match_interp = MatchInterpreter()   # run() resets its reduction counter
+
+
+def _compiler():
+    """This process's Compiler — one per worker, never shared across processes."""
+    global _worker_compiler
+    if _worker_compiler is None:
+        _worker_compiler = Compiler()
+    return _worker_compiler
+
+
+@lru_cache(maxsize=4096)
+def _compile_main(source):
+    """Compile source once and return its main definition (None if absent).
+
+    Random parameter fills repeat often, so identical sources are common.
+    """
+    return _compiler().compile_program(source).get("main")
+
+
+@lru_cache(maxsize=4096)
+def _run_main(source):
+    """Evaluate source's main, reusing the cached compile instead of re-parsing."""
+    return _match_interp.run(_compile_main(source))
+
+
+def _gen_example(i, seed, output_dir):
+    """Generate, verify and write example i. Returns its manifest entry or None.
+
+    All randomness comes from an RNG seeded by (seed, i), so the output does
+    not depend on which process handles the example or in what order.
+    """
+    rng = random.Random(f"{seed}:example:{i}")
+
+    category = rng.choice(list(_COMPILED_TEMPLATES.keys()))
+    templates = _COMPILED_TEMPLATES[category]
+    template, compute_fn = rng.choice(templates)
+
+    # Generate random parameters
+    params = _random_params(template, rng)
+    if category == "string":
+        words = ["hello", "world", "xi", "lang", "ai", "code", "test"]
+        params = {"s1": rng.choice(words), "s2": rng.choice(words)}
+    source_expr = template.render(params)
+
+    # Build full source
+    if "def " in source_expr:
+        source = source_expr
+    else:
+        source = f"def main = {source_expr}"
+
+    # Compile and evaluate
+    try:
+        node = _compile_main(source)
+        if not node:
+            return None
+        result = _run_main(source)
+        if isinstance(result, Constructor):
+            try:
+                result = nat_to_int(_match_interp, result)
+            except:
+                result = str(result)
+    except:
+        return None
+
+    # Compute expected (for verification)
+    try:
+        if category == "string":
+            expected = compute_fn(**params)
         else:
-            source = f"def main = {source_expr}"
-
-        # Compile and evaluate
-        try:
-            node = c.compile_program(source).get("main")
-            if not node:
-                continue
-            result = c.run_program(source, "main")
-            if isinstance(result, Constructor):
-                try:
-                    result = nat_to_int(MatchInterpreter(), result)
-                except:
-                    result = str(result)
-        except:
-            continue
-
-        # Compute expected (for verification)
-        try:
-            if category == "string":
-                expected = compute_fn(**params)
-            else:
-                int_params = {k: v for k, v in params.items() if isinstance(v, int)}
-                expected = compute_fn(**int_params)
-        except:
-            expected = result
-
-        # Build example record
-        ir = to_json(node, include_hash=True)
-        binary = serialize(node)
-        props = analyze_properties(node)
-
-        example_id = f"ex_{i:06d}"
-        record = {
-            "id": example_id,
-            "category": category,
-            "source": source,
-            "ir": ir,
-            "binary_base64": base64.b64encode(binary).decode(),
-            "binary_size": len(binary),
-            "expected_output": result,
-            "verified": result == expected,
-            "hash": hash_node(node),
-            "node_count": node_count(node),
-            "properties": props["properties"],
-            "effects": props["effects"],
+            int_params = {k: v for k, v in params.items() if isinstance(v, int)}
+            expected = compute_fn(**int_params)
+    except:
+        expected = result
+
+    # Build example record
+    ir = to_json(node, include_hash=True)
+    binary = serialize(node)
+    props = analyze_properties(node)
+
+    example_id = f"ex_{i:06d}"
+    record = {
+        "id": example_id,
+        "category": category,
+        "source": source,
+        "ir": ir,
+        "binary_base64": base64.b64encode(binary).decode(),
+        "binary_size": len(binary),
+        "expected_output": result,
+        "verified": result == expected,
+        "hash": hash_node(node),
+        "node_count": node_count(node),
+        "properties": props["properties"],
+        "effects": props["effects"],
+    }
+
+    # Save individual file
+    path = os.path.join(output_dir, "examples", f"{example_id}.json")
+    _write_json(path, record)
+
+    return {"id": example_id, "category": category, "hash": record["hash"]}
+
+
+def _gen_mutation(i, seed, output_dir):
+    """Generate and write mutation pair i. Returns its manifest entry or None."""
+    rng = random.Random(f"{seed}:mutation:{i}")
+
+    desc, orig_tmpl, mutated_tmpl = rng.choice(_COMPILED_MUTATIONS)
+    params = _random_params(orig_tmpl, rng)
+    try:
+        orig_src = orig_tmpl.render(params)
+        mut_src = mutated_tmpl.render(params)
+        if "def " not in orig_src:
+            orig_src = f"def main = {orig_src}"
+        if "def " not in mut_src:
+            mut_src = f"def main = {mut_src}"
+
+        orig_node = _compile_main(orig_src)
+        mut_node = _compile_main(mut_src)
+        if not orig_node or not mut_node:
+            return None
+
+        orig_result = _run_main(orig_src)
+        mut_result = _run_main(mut_src)
+
+        ops = diff(orig_node, mut_node)
+        stats = diff_stats(ops)
+
+        mut_id = f"mut_{i:06d}"
+        mutation_record = {
+            "id": mut_id,
+            "description": desc,
+            "original_source": orig_src,
+            "mutated_source": mut_src,
+            "original_output": orig_result,
+            "mutated_output": mut_result,
+            "patch": ops,
+            "diff_stats": stats,
+            "original_hash": hash_node(orig_node),
+            "mutated_hash": hash_node(mut_node),
         }
 
-        # Save individual file
-        path = os.path.join(output_dir, "examples", f"{example_id}.json")
-        with open(path, 'w') as f:
-            json.dump(record, f, indent=2, default=str)
+        path = os.path.join(output_dir, "mutations", f"{mut_id}.json")
+        _write_json(path, mutation_record)
+
+        return {"id": mut_id, "description": desc}
+    except:
+        return None
+
+
+def generate_dataset(n=100, output_dir="dataset", jobs=1, seed=None):
+    """Generate n training examples with JSON metadata.
 
-        manifest["examples"].append({"id": example_id, "category": category,
-                                      "hash": hash_node(node)})
-        generated += 1
+    Examples and mutations are independent, so with jobs > 1 they are
+    generated in a process pool. seed fixes the output; by default it is
+    drawn from the global random module.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(os.path.join(output_dir, "examples"), exist_ok=True)
+    os.makedirs(os.path.join(output_dir, "mutations"), exist_ok=True)
 
-    # Generate mutations
+    if seed is None:
+        seed = random.getrandbits(64)
+    manifest = {"version": "xi-dataset-v1", "count": 0, "examples": [], "mutations": []}
     mutation_count = min(n // 2, len(MUTATIONS) * 20)
-    for i in range(mutation_count):
-        desc, orig_tmpl, mutated_tmpl = random.choice(MUTATIONS)
-        params = _random_params(orig_tmpl)
-        try:
-            orig_src = orig_tmpl.format(**params)
-            mut_src = mutated_tmpl.format(**params)
-            if "def " not in orig_src:
-                orig_src = f"def main = {orig_src}"
-            if "def " not in mut_src:
-                mut_src = f"def main = {mut_src}"
-
-            orig_node = c.compile_program(orig_src).get("main")
-            mut_node = c.compile_program(mut_src).get("main")
-            if not orig_node or not mut_node:
-                continue
-
-            orig_result = c.run_program(orig_src, "main")
-            mut_result = c.run_program(mut_src, "main")
-
-            ops = diff(orig_node, mut_node)
-            stats = diff_stats(ops)
-
-            mut_id = f"mut_{i:06d}"
-            mutation_record = {
-                "id": mut_id,
-                "description": desc,
-                "original_source": orig_src,
-                "mutated_source": mut_src,
-                "original_output": orig_result,
-                "mutated_output": mut_result,
-                "patch": ops,
-                "diff_stats": stats,
-                "original_hash": hash_node(orig_node),
-                "mutated_hash": hash_node(mut_node),
-            }
-
-            path = os.path.join(output_dir, "mutations", f"{mut_id}.json")
-            with open(path, 'w') as f:
-                json.dump(mutation_record, f, indent=2, default=str)
-
-            manifest["mutations"].append({"id": mut_id, "description": desc})
-        except:
-            continue
-
-    manifest["count"] = generated
-    with open(os.path.join(output_dir, "manifest.json"), 'w') as f:
-        json.dump(manifest, f, indent=2)
+
+    gen_example = partial(_gen_example, seed=seed, output_dir=output_dir)
+    gen_mutation = partial(_gen_mutation, seed=seed, output_dir=output_dir)
+    if jobs > 1:
+        chunksize = max(1, n // (jobs * 8))
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            examples = list(pool.map(gen_example, range(n), chunksize=chunksize))
+            mutations = list(pool.map(gen_mutation, range(mutation_count),
+                                      chunksize=chunksize))
+    else:
+        examples = [gen_example(i) for i in range(n)]
+        mutations = [gen_mutation(i) for i in range(mutation_count)]
+
+    manifest["examples"] = [e for e in examples if e is not None]
+    manifest["mutations"] = [m for m in mutations if m is not None]
+    manifest["count"] = len(manifest["examples"])
+    _write_json(os.path.join(output_dir, "manifest.json"), manifest)
 
     print(json.dumps({
         "ok": True,
-        "examples_generated": generated,
+        "examples_generated": manifest["count"],
         "mutations_generated": len(manifest["mutations"]),
         "output_dir": output_dir
     }, indent=2))
 
 
-def _random_params(template):
-    """Generate random parameters for a template."""
+def _random_params(template, rng=random):
+    """Generate random parameters for a compiled Template."""
     params = {}
-    for key in ['a', 'b', 'c', 'd']:
-        if '{' + key + '}' in template:
-            params[key] = random.randint(1, 20)
+    for key in ('a', 'b', 'c', 'd'):
+        if key in template.keys:
+            params[key] = rng.randint(1, 20)
     return params
 
 
 if __name__ == "__main__":
     import sys
-    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
-    generate_dataset(n)
+    args = [a for a in sys.argv[1:] if a != "--parallel"]
+    n = int(args[0]) if args else 100
+    jobs = (os.cpu_count() or 1) if "--parallel" in sys.argv else 1
+    generate_dataset(n, jobs=jobs)
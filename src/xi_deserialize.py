@@ -97,15 +97,14 @@ def deserialize(data: bytes) -> Node:
         elif tag == Tag.EFF:
             effect = data[pos]; pos += 1
 
-        node = Node(tag=tag, prim_op=prim_op, data=node_data,
-                    effect=effect, universe_level=universe_level)
-        node._child_indices = child_indices
+        # children holds raw indices until every node exists
+        node = Node(tag=tag, children=child_indices, prim_op=prim_op,
+                    data=node_data, effect=effect, universe_level=universe_level)
         nodes.append(node)
 
     # Resolve indices → references
     for node in nodes:
-        node.children = [nodes[idx] for idx in node._child_indices]
-        del node._child_indices
+        node.children = [nodes[idx] for idx in node.children]
 
     return nodes[root_index]
 
@@ -13,82 +13,126 @@ Tasks:
   5. Proof/trace check (type soundness)
 """
 
-import json, time, sys, os, random, traceback
+import json, time, sys, os, re
+from functools import lru_cache
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
 
-from xi import Node, Tag, PrimOp, serialize
-from xi_compiler import Compiler, ParseError
-from xi_match import MatchInterpreter, Constructor, nat_to_int
-from xi_json import to_json, from_json, canonicalize, hash_node, diff, patch, diff_stats, node_count
-from xi_optimizer import optimize
+from xi_compiler import Compiler
+from xi_json import hash_node, diff, patch, diff_stats, node_count
 from xi_sandbox import SandboxedInterpreter, SandboxConfig
-from xi_typecheck import TypeChecker, TypeErr, type_to_str
+from xi_typecheck import TypeChecker, TypeErr, type_to_str, resolve_type, Context
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
 
 
 # ═══════════════════════════════════════════
 # TASK DEFINITIONS
 # ═══════════════════════════════════════════
 
+@lru_cache(maxsize=256)
+def _compile_main(compiler, source):
+    """Compile source with compiler and return its main definition.
+
+    Catalog tasks share many sources, so each distinct one is compiled once.
+    Nothing downstream mutates the node (patch() copies the nodes it edits).
+    """
+    return compiler.compile_program(source).get("main")
+
+
+# Free type variable names: ?t<global counter id>
+_TVAR_RE = re.compile(r"\?t\d+")
+
+
+def _infer_type_str(tc, node):
+    """Rendered type of a closed program, or "unknown" if it is ill-typed.
+
+    Free type variables are renumbered ?t1, ?t2, ... in order of first
+    appearance, since their ids come from a process-wide counter.
+    """
+    tc.reset()
+    try:
+        ty = type_to_str(resolve_type(tc.infer(Context(), node)))
+    except TypeErr:
+        return "unknown"
+    names = {}
+    return _TVAR_RE.sub(
+        lambda m: names.setdefault(m.group(), f"?t{len(names) + 1}"), ty)
+
+
 class EvalTask:
     """A single evaluation task."""
-    def __init__(self, name, category, description, original, expected, check_fn):
+    __slots__ = ("name", "category", "description", "original", "expected",
+                 "check_fn", "needs_orig_val", "needs_exp_val")
+
+    def __init__(self, name, category, description, original, expected, check_fn,
+                 needs=(True, True)):
         self.name = name
         self.category = category
         self.description = description
-        self.original = original        # source code
-        self.expected = expected         # expected source after transformation
-        self.check_fn = check_fn        # (original_node, result_node) → bool
-
-    def run(self, compiler):
-        """Execute the task and return metrics."""
+        # Interned, so _compile_main's cache compares shared sources by identity
+        self.original = sys.intern(original)    # source code
+        self.expected = sys.intern(expected)    # expected source after transformation
+        self.check_fn = check_fn        # (orig_node, exp_node, orig_val, exp_val) → bool
+        # (orig_val, exp_val) that check_fn reads; the other runs are skipped
+        self.needs_orig_val, self.needs_exp_val = needs
+
+    def run(self, compiler, sandbox=None, tc=None):
+        """Execute the task and return metrics.
+
+        sandbox, if given, is a strict SandboxedInterpreter reused across
+        tasks; it is reset before each evaluation. tc is likewise a shared
+        TypeChecker.
+        """
         start = time.monotonic()
         result = {"task": self.name, "category": self.category}
 
         try:
             # Compile original
-            orig_node = compiler.compile_program(self.original).get("main")
+            orig_node = _compile_main(compiler, self.original)
             if not orig_node:
                 result["status"] = "error"
                 result["error"] = "Cannot compile original"
                 return result
 
             # Compile expected
-            exp_node = compiler.compile_program(self.expected).get("main")
+            exp_node = _compile_main(compiler, self.expected)
             if not exp_node:
                 result["status"] = "error"
                 result["error"] = "Cannot compile expected"
                 return result
 
+            # Hash each tree once; diff reuses the memoized subtree hashes
+            memo = {}
+            orig_hash = hash_node(orig_node, memo)
+            exp_hash = hash_node(exp_node, memo)
+
             # Compute diff
-            ops = diff(orig_node, exp_node)
+            ops = diff(orig_node, exp_node, memo=memo)
             stats = diff_stats(ops)
 
-            # Verify patch roundtrip
-            if ops:
-                patched = patch(orig_node, ops)
-                patch_hash = hash_node(patched)
-                target_hash = hash_node(exp_node)
-                patch_ok = patch_hash == target_hash
-            else:
-                patch_ok = hash_node(orig_node) == hash_node(exp_node)
+            # Verify patch roundtrip; an empty diff already means equal hashes
+            patch_ok = not ops or hash_node(patch(orig_node, ops)) == exp_hash
 
             # Eval both
-            sandbox = SandboxedInterpreter(SandboxConfig.strict())
-            orig_val, _ = sandbox.eval_safe(orig_node)
-            sandbox2 = SandboxedInterpreter(SandboxConfig.strict())
-            exp_val, _ = sandbox2.eval_safe(exp_node)
-
-            # Type check both
-            tc = TypeChecker()
-            try:
-                orig_type = type_to_str(tc.infer_type(orig_node))
-            except:
-                orig_type = "unknown"
-            try:
-                exp_type = type_to_str(tc.infer_type(exp_node))
-            except:
-                exp_type = "unknown"
+            if sandbox is None:
+                sandbox = SandboxedInterpreter(SandboxConfig.strict())
+            orig_val = exp_val = None
+            if self.needs_orig_val:
+                sandbox.reset()
+                orig_val, _ = sandbox.eval_safe(orig_node)
+            if self.needs_exp_val:
+                sandbox.reset()
+                exp_val, _ = sandbox.eval_safe(exp_node)
+
+            # Type check both; only TypeErr means "unknown", other errors propagate
+            if tc is None:
+                tc = TypeChecker()
+            orig_type = _infer_type_str(tc, orig_node)
+            exp_type = _infer_type_str(tc, exp_node)
 
             # Custom check
             custom_ok = self.check_fn(orig_node, exp_node, orig_val, exp_val)
@@ -102,8 +146,9 @@ class EvalTask:
                 "diff_modifications": stats["modifications"],
                 "original_nodes": node_count(orig_node),
                 "expected_nodes": node_count(exp_node),
-                "original_hash": hash_node(orig_node),
-                "expected_hash": hash_node(exp_node),
+                "original_hash": orig_hash,
+                "expected_hash": exp_hash,
+                # None for a value check_fn does not read (never evaluated)
                 "original_value": orig_val,
                 "expected_value": exp_val,
                 "original_type": orig_type,
@@ -145,7 +190,8 @@ def build_tasks():
         "Add a conditional guard to a computation",
         "def f x = x * x\ndef main = f 5",
         "def f x = if x > 0 then x * x else 0\ndef main = f 5",
-        lambda o, e, ov, ev: ev == 25  # Same result for positive
+        lambda o, e, ov, ev: ev == 25,  # Same result for positive
+        needs=(False, True)
     ))
 
     tasks.append(EvalTask(
@@ -163,7 +209,8 @@ def build_tasks():
         "Extend program with string operation",
         'def main = "hello"',
         'def main = "hello" ++ " world"',
-        lambda o, e, ov, ev: ev == "hello world"
+        lambda o, e, ov, ev: ev == "hello world",
+        needs=(False, True)
     ))
 
     # ── Category 2: Refactor ──
@@ -221,7 +268,8 @@ def build_tasks():
         "Merge two branches with independent new functions",
         "def main = 42",
         "def double x = x + x\ndef triple x = x + x + x\ndef main = double 10 + triple 5",
-        lambda o, e, ov, ev: ev == 35
+        lambda o, e, ov, ev: ev == 35,
+        needs=(False, True)
     ))
 
     tasks.append(EvalTask(
@@ -241,7 +289,8 @@ def build_tasks():
         "Change one constant — should be 1 op",
         "def main = 5 + 3",
         "def main = 5 + 7",
-        lambda o, e, ov, ev: ev == 12
+        lambda o, e, ov, ev: ev == 12,
+        needs=(False, True)
     ))
 
     tasks.append(EvalTask(
@@ -250,7 +299,8 @@ def build_tasks():
         "Change one operator — should be 1 op",
         "def main = 5 + 3",
         "def main = 5 * 3",
-        lambda o, e, ov, ev: ev == 15
+        lambda o, e, ov, ev: ev == 15,
+        needs=(False, True)
     ))
 
     tasks.append(EvalTask(
@@ -289,23 +339,61 @@ def build_tasks():
 # HARNESS RUNNER
 # ═══════════════════════════════════════════
 
-def run_eval_harness(verbose=False):
-    """Run all evaluation tasks and report results."""
+@lru_cache(maxsize=None)
+def _task_catalog():
+    """This process's tasks by name (check_fn lambdas cannot be pickled)."""
+    return {task.name: task for task in build_tasks()}
+
+
+_worker_state = None
+
+
+def _worker():
+    """This process's (Compiler, sandbox, TypeChecker) — never shared across processes."""
+    global _worker_state
+    if _worker_state is None:
+        _worker_state = (Compiler(), SandboxedInterpreter(SandboxConfig.strict()),
+                         TypeChecker())
+    return _worker_state
+
+
+def _run_task(name):
+    """Run one catalog task by name. Module-level so a process pool can pickle it."""
+    return _task_catalog()[name].run(*_worker())
+
+
+def run_eval_harness(verbose=False, jobs=1):
+    """Run all evaluation tasks and report results.
+
+    Tasks are independent, so jobs > 1 runs them in that many worker
+    processes; each worker rebuilds the catalog and owns its Compiler,
+    sandbox and TypeChecker.
+    """
     tasks = build_tasks()
-    compiler = Compiler()
-    results = []
     categories = {}
 
     start = time.monotonic()
 
-    for task in tasks:
-        result = task.run(compiler)
-        results.append(result)
-
-        cat = task.category
-        if cat not in categories:
-            categories[cat] = {"pass": 0, "fail": 0, "error": 0}
-        categories[cat][result["status"]] = categories[cat].get(result["status"], 0) + 1
+    if jobs > 1 and len(tasks) > 1:
+        # Imported here: the pool machinery is the costliest import and
+        # serial runs never need it
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+            results = list(pool.map(_run_task, [task.name for task in tasks]))
+    else:
+        compiler = Compiler()
+        sandbox = SandboxedInterpreter(SandboxConfig.strict())
+        tc = TypeChecker()
+        results = [task.run(compiler, sandbox, tc) for task in tasks]
+
+    totals = {"pass": 0, "fail": 0, "error": 0}
+    for task, result in zip(tasks, results):
+        status = result["status"]
+        counts = categories.get(task.category)
+        if counts is None:
+            counts = categories[task.category] = {"pass": 0, "fail": 0, "error": 0}
+        counts[status] += 1
+        totals[status] += 1
 
         if verbose:
             status_icon = "✓" if result["status"] == "pass" else "✗" if result["status"] == "fail" else "!"
@@ -317,9 +405,7 @@ def run_eval_harness(verbose=False):
 
     # Summary
     total = len(results)
-    passed = sum(1 for r in results if r["status"] == "pass")
-    failed = sum(1 for r in results if r["status"] == "fail")
-    errors = sum(1 for r in results if r["status"] == "error")
+    passed, failed, errors = totals["pass"], totals["fail"], totals["error"]
 
     avg_diff = sum(r.get("diff_ops", 0) for r in results if r["status"] == "pass") / max(1, passed)
     avg_time = sum(r.get("validation_time_ms", 0) for r in results) / max(1, total)
@@ -358,11 +444,26 @@ def run_eval_harness(verbose=False):
     return report
 
 
+def _dumps(report):
+    """Report as indented JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                report, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+                default=str)
+        except TypeError:  # e.g. ints wider than 64 bits
+            pass
+    return json.dumps(report, indent=2, default=str).encode()
+
+
 def main():
     verbose = "--verbose" in sys.argv or "-v" in sys.argv
+    jobs = (os.cpu_count() or 1) if "--parallel" in sys.argv else 1
     print("Ξ Xi Eval Harness — AI Task Benchmarks", file=sys.stderr)
-    report = run_eval_harness(verbose=verbose)
-    print(json.dumps(report, indent=2, default=str))
+    report = run_eval_harness(verbose=verbose, jobs=jobs)
+    sys.stdout.flush()
+    sys.stdout.buffer.write(_dumps(report) + b"\n")
+    sys.stdout.flush()
     sys.exit(0 if report["summary"]["failed"] == 0 and report["summary"]["errors"] == 0 else 1)
 
 
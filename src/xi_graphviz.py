@@ -11,7 +11,7 @@ Usage:
   python xi_graphviz.py demo               # demo with example programs
 """
 
-import sys, os, subprocess
+import sys, os, shutil, subprocess
 sys.path.insert(0, os.path.dirname(__file__))
 from xi import Node, Tag, PrimOp, Effect, B, TAG_SYMBOL, PRIM_NAME, EFFECT_NAME
 
@@ -39,10 +39,22 @@ TAG_SHAPES = {
     Tag.UNI: "doublecircle",
 }
 
+# (first edge, every later edge) labels for binder-like tags
+_EDGE_LABELS = {
+    Tag.LAM: ("type", "body"),
+    Tag.APP: ("func", "arg"),
+    Tag.PI:  ("dom", "cod"),
+}
+
 
 def to_dot(root: Node, title: str = "Xi Graph") -> str:
     """Convert a Xi graph to Graphviz DOT format."""
-    lines = [
+    return '\n'.join(iter_dot(root, title))
+
+
+def iter_dot(root: Node, title: str = "Xi Graph"):
+    """Yield the lines of to_dot(root, title) one at a time (no newlines)."""
+    yield from (
         'digraph Xi {',
         '  rankdir=TB;',
         '  bgcolor="#1e1b2e";',
@@ -54,9 +66,10 @@ def to_dot(root: Node, title: str = "Xi Graph") -> str:
         '  node [fontname="Helvetica", fontsize=11, style=filled, color="#334155"];',
         '  edge [color="#94a3b8", arrowsize=0.7];',
         '',
-    ]
+    )
 
     visited = {}
+    emitted = set()   # ids whose node line has been written
     counter = [0]
 
     def node_id(node):
@@ -66,94 +79,185 @@ def to_dot(root: Node, title: str = "Xi Graph") -> str:
             counter[0] += 1
         return visited[nid]
 
-    def walk(node):
+    # Iterative pre-order walk (no recursion limit on deep graphs). Each
+    # child is pushed above a pending (parent, child, index) edge, so an
+    # edge line follows its child's whole subtree, as in a recursive walk.
+    stack = [root]
+    _push, _pop = stack.append, stack.pop
+    while stack:
+        item = _pop()
+
+        if isinstance(item, tuple):
+            parent, child, i = item
+            nid, cid = node_id(parent), node_id(child)
+            labels = _EDGE_LABELS.get(parent.tag)
+            if labels:
+                edge_label = labels[0] if i == 0 else labels[1]
+                yield f'  {nid} -> {cid} [label=" {edge_label}", fontcolor="#94a3b8", fontsize=9];'
+            else:
+                yield f'  {nid} -> {cid};'
+            continue
+
+        node = item
         nid = node_id(node)
-        if nid in [l.split('[')[0].strip() for l in lines if l.strip().startswith('n')]:
-            return nid
+        if nid in emitted:
+            continue
 
         # Node label
-        label = _node_label(node)
-        color = TAG_COLORS.get(node.tag, "#475569")
-        shape = TAG_SHAPES.get(node.tag, "ellipse")
+        color, shape, label_fn = _TAG_META[node.tag]
+        label = label_fn(node)
         fontcolor = "#ffffff"
 
-        lines.append(
+        yield (
             f'  {nid} [label="{label}", fillcolor="{color}", '
             f'fontcolor="{fontcolor}", shape={shape}];'
         )
+        emitted.add(nid)
 
         # Edges
-        for i, child in enumerate(node.children):
-            cid = walk(child)
-            edge_label = ""
-            if node.tag == Tag.LAM:
-                edge_label = "type" if i == 0 else "body"
-            elif node.tag == Tag.APP:
-                edge_label = "func" if i == 0 else "arg"
-            elif node.tag == Tag.PI:
-                edge_label = "dom" if i == 0 else "cod"
-
-            if edge_label:
-                lines.append(f'  {nid} -> {cid} [label=" {edge_label}", fontcolor="#94a3b8", fontsize=9];')
-            else:
-                lines.append(f'  {nid} -> {cid};')
+        children = node.children
+        for i in range(len(children) - 1, -1, -1):
+            _push((node, children[i], i))
+            _push(children[i])
 
-        return nid
-
-    walk(root)
-    lines.append('}')
-    return '\n'.join(lines)
+    yield '}'
 
 
 def _node_label(node: Node) -> str:
     """Compact label for DOT node."""
-    sym = TAG_SYMBOL.get(node.tag, "?")
-
-    if node.tag == Tag.PRIM:
-        if node.prim_op == PrimOp.INT_LIT:
-            return str(node.data)
-        if node.prim_op == PrimOp.STR_LIT:
-            s = node.data if len(node.data) <= 12 else node.data[:10] + "…"
-            return f'\\"{s}\\"'
-        if node.prim_op == PrimOp.FLOAT_LIT:
-            return str(node.data)
-        if node.prim_op == PrimOp.VAR:
-            return f"var({node.data})"
-        if node.prim_op == PrimOp.BOOL_TRUE:
-            return "true"
-        if node.prim_op == PrimOp.BOOL_FALSE:
-            return "false"
-        if node.prim_op == PrimOp.UNIT:
-            return "()"
-        name = PRIM_NAME.get(node.prim_op, f"op{node.prim_op}")
-        return f"#{name}"
-
-    if node.tag == Tag.UNI:
-        return f"𝒰{node.universe_level}"
-
-    if node.tag == Tag.EFF:
-        effs = [EFFECT_NAME.get(e, "?") for e in Effect if e != Effect.PURE and node.effect & e]
-        return f"!{{{','.join(effs)}}}"
-
-    return sym
+    return _TAG_META[node.tag][2](node)
+
+
+def _str_label(node: Node) -> str:
+    s = node.data if len(node.data) <= 12 else node.data[:10] + "…"
+    return f'\\"{s}\\"'
+
+
+# Literal and constant prims; every other prim_op is labelled by name
+_PRIM_LABELS = {
+    PrimOp.INT_LIT:    lambda node: str(node.data),
+    PrimOp.STR_LIT:    _str_label,
+    PrimOp.FLOAT_LIT:  lambda node: str(node.data),
+    PrimOp.VAR:        lambda node: f"var({node.data})",
+    PrimOp.BOOL_TRUE:  lambda node: "true",
+    PrimOp.BOOL_FALSE: lambda node: "false",
+    PrimOp.UNIT:       lambda node: "()",
+}
+
+
+def _prim_label(node: Node) -> str:
+    op = node.prim_op
+    label_fn = _PRIM_LABELS.get(op)
+    if label_fn is not None:
+        return label_fn(node)
+    return f"#{PRIM_NAME.get(op, f'op{op}')}"
+
+
+def _uni_label(node: Node) -> str:
+    return f"𝒰{node.universe_level}"
+
+
+def _eff_label(node: Node) -> str:
+    effs = [EFFECT_NAME.get(e, "?") for e in Effect if e != Effect.PURE and node.effect & e]
+    return f"!{{{','.join(effs)}}}"
+
+
+def _symbol_label(sym):
+    return lambda node: sym
+
+
+# int(tag) → (fill color, shape, label function), so each node needs one lookup
+_TAG_META = [
+    (TAG_COLORS.get(tag, "#475569"), TAG_SHAPES.get(tag, "ellipse"),
+     {Tag.PRIM: _prim_label, Tag.UNI: _uni_label, Tag.EFF: _eff_label}.get(
+         tag, _symbol_label(TAG_SYMBOL.get(tag, "?"))))
+    for tag in sorted(Tag)
+]
 
 
 def render_svg(dot: str, output_path: str):
     """Render DOT to SVG using graphviz (if installed)."""
     try:
+        # Bytes in, bytes straight to disk: no decode/re-encode of the SVG
         result = subprocess.run(
             ['dot', '-Tsvg'],
-            input=dot, capture_output=True, text=True, timeout=10
+            input=dot.encode('utf-8'), capture_output=True, timeout=10
         )
         if result.returncode != 0:
-            raise RuntimeError(result.stderr)
-        with open(output_path, 'w') as f:
+            raise RuntimeError(result.stderr.decode('utf-8', 'replace'))
+        with open(output_path, 'wb') as f:
             f.write(result.stdout)
         return True
     except FileNotFoundError:
         return False
 
 
+def render_graph_svg(root: Node, output_path: str, title: str = "Xi Graph"):
+    """Render a Xi graph to SVG, streaming its DOT lines into graphviz.
+
+    dot reads the lines as iter_dot produces them and writes the SVG
+    straight to output_path, so neither text is ever held whole in memory.
+    Returns False if graphviz is not installed.
+    """
+    if shutil.which('dot') is None:
+        return False
+    done = False
+    try:
+        with open(output_path, 'wb') as out:
+            proc = subprocess.Popen(['dot', '-Tsvg'], stdin=subprocess.PIPE,
+                                    stdout=out, stderr=subprocess.PIPE)
+            try:
+                with proc:
+                    write = proc.stdin.write   # buffered, so one syscall per block
+                    try:
+                        for line in iter_dot(root, title):
+                            write(line.encode('utf-8'))
+                            write(b'\n')
+                        proc.stdin.close()
+                    except BrokenPipeError:
+                        pass   # dot exited early; its stderr says why
+                    err = proc.stderr.read()
+            except BrokenPipeError:
+                pass   # Popen.__exit__ flushing what dot never read
+        if proc.returncode != 0:
+            raise RuntimeError(err.decode('utf-8', 'replace'))
+        done = True
+    finally:
+        if not done:
+            try:
+                os.remove(output_path)
+            except OSError:
+                pass
+    return True
+
+
+def render_svg_batch(dot_paths):
+    """Render several .dot files to SVG with a single graphviz process.
+
+    Each foo.dot becomes foo.svg beside it. Returns False if graphviz is
+    not installed.
+    """
+    if not dot_paths:
+        return True
+    try:
+        result = subprocess.run(
+            ['dot', '-Tsvg', '-O', *dot_paths],
+            capture_output=True, text=True, timeout=10 * len(dot_paths)
+        )
+    except FileNotFoundError:
+        return False
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    for path in dot_paths:
+        # -O names the output foo.dot.svg
+        os.replace(path + '.svg', os.path.splitext(path)[0] + '.svg')
+    return True
+
+
+# Demo title → file-name stem
+_SAFE_NAME = str.maketrans({' ': '_', ':': None, '(': None, ')': None, '+': None})
+
+
 def run_demo():
     print("╔═══════════════════════════════════════════════════════════╗")
     print("║  Ξ (Xi) Graph Visualization v0.1                         ║")
@@ -175,20 +279,22 @@ def run_demo():
     out_dir = os.path.join(os.path.dirname(__file__), '..', 'docs', 'assets')
     os.makedirs(out_dir, exist_ok=True)
 
+    dot_paths = []
     for name, prog in programs:
         dot = to_dot(prog, title=f"Ξ — {name}")
-        safe_name = name.lower().replace(' ', '_').replace(':', '').replace('(', '').replace(')', '').replace('+', '')
+        safe_name = name.lower().translate(_SAFE_NAME)
         dot_path = os.path.join(out_dir, f"graph_{safe_name}.dot")
         with open(dot_path, 'w') as f:
             f.write(dot)
+        dot_paths.append(dot_path)
         print(f"  ✓ {name} → {os.path.basename(dot_path)}")
 
-        # Try SVG render
-        svg_path = dot_path.replace('.dot', '.svg')
-        if render_svg(dot, svg_path):
-            print(f"    → {os.path.basename(svg_path)} (rendered)")
-        else:
-            print(f"    (install graphviz to render SVG: brew install graphviz)")
+    # Try SVG render — one dot process for every graph
+    if render_svg_batch(dot_paths):
+        for dot_path in dot_paths:
+            print(f"    → {os.path.basename(dot_path).replace('.dot', '.svg')} (rendered)")
+    else:
+        print(f"    (install graphviz to render SVG: brew install graphviz)")
 
     print()
     print("  DOT files saved. Render with:")
@@ -200,16 +306,15 @@ if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] != "demo":
         from xi_deser import load_file
         node = load_file(sys.argv[1])
-        dot = to_dot(node, title=sys.argv[1])
         if len(sys.argv) > 3 and sys.argv[2] == "-o":
             out = sys.argv[3]
             if out.endswith('.svg'):
-                render_svg(dot, out)
+                render_graph_svg(node, out, title=sys.argv[1])
             else:
                 with open(out, 'w') as f:
-                    f.write(dot)
+                    f.write(to_dot(node, title=sys.argv[1]))
             print(f"Saved: {out}")
         else:
-            print(dot)
+            print(to_dot(node, title=sys.argv[1]))
     else:
         run_demo()
@@ -174,10 +174,11 @@ def canonicalize(node):
     """Return a canonical form of the node (structurally shared, deterministic).
     Two semantically equivalent nodes produce the same canonical form.
     """
-    memo = {}  # hash → canonical node
+    memo = {}    # hash → canonical node
+    hashes = {}  # id(node) → hash, so each subtree is hashed once
 
     def canon(n):
-        h = hash_node(n)
+        h = hash_node(n, hashes)
         if h in memo:
             return memo[h]
         children = [canon(c) for c in n.children]
@@ -199,42 +200,76 @@ def canonicalize_json(obj):
 # CONTENT-ADDRESSED HASHING
 # ═══════════════════════════════════════════
 
-def hash_node(node):
-    """SHA-256 hash of a node, including all children (content-addressed)."""
-    h = hashlib.sha256()
-    h.update(bytes([node.tag]))
-    h.update(bytes([len(node.children)]))
+def hash_node(node, memo=None):
+    """SHA-256 hash of a node, including all children (content-addressed).
 
-    for child in node.children:
-        h.update(bytes.fromhex(hash_node(child)))
-
-    # Hash prim_op if present
-    if hasattr(node, 'prim_op') and node.prim_op is not None and isinstance(node.prim_op, PrimOp):
-        h.update(b'P')
-        h.update(bytes([node.prim_op.value]))
-
-    if node.data is not None:
-        if isinstance(node.data, int):
-            h.update(b'I')
-            h.update(node.data.to_bytes(8, 'little', signed=True))
-        elif isinstance(node.data, str):
-            h.update(b'S')
-            h.update(node.data.encode('utf-8'))
-        elif isinstance(node.data, PrimOp):
-            h.update(b'P')
-            h.update(bytes([node.data.value]))
-        elif isinstance(node.data, bytes):
-            h.update(b'B')
-            h.update(node.data)
-
-    return h.hexdigest()
+    memo, if given, is a dict keyed by id(node) that caches digests across
+    calls; it is only valid while the hashed graphs are alive and unchanged.
+    """
+    if memo is not None:
+        cached = memo.get(id(node))
+        if cached is not None:
+            return cached
+
+    # One iterative post-order pass (no recursion limit on deep graphs).
+    # Children hand their raw digests straight to the parent, with no hex
+    # round trip, and each node's fields go to a single sha256() call.
+    digests = {}   # id(node) → raw digest, for this call
+    stack = [(node, False)]
+
+    # Hot-loop locals
+    _id, _sha256, _PrimOp = id, hashlib.sha256, PrimOp
+    _push, _pop = stack.append, stack.pop
+    _memo = memo.get if memo is not None else None
+
+    while stack:
+        n, ready = _pop()
+        nid = _id(n)
+        if nid in digests:
+            continue
+        children = n.children
+        if not ready:
+            if _memo is not None:
+                cached = _memo(nid)
+                if cached is not None:
+                    digests[nid] = bytes.fromhex(cached)
+                    continue
+            if children:
+                _push((n, True))
+                for child in children:
+                    _push((child, False))
+                continue
+
+        parts = [bytes((n.tag, len(children)))]
+        if children:
+            parts += [digests[_id(c)] for c in children]
+
+        # Hash prim_op if present
+        prim_op = n.prim_op
+        if prim_op is not None and isinstance(prim_op, _PrimOp):
+            parts.append(b'P' + bytes((prim_op.value,)))
+
+        data = n.data
+        if data is not None:
+            if isinstance(data, int):   # includes PrimOp (an IntEnum)
+                parts.append(b'I' + data.to_bytes(8, 'little', signed=True))
+            elif isinstance(data, str):
+                parts.append(b'S' + data.encode('utf-8'))
+            elif isinstance(data, bytes):
+                parts.append(b'B' + data)
+
+        digest = digests[nid] = _sha256(b''.join(parts)).digest()
+        if memo is not None:
+            memo[nid] = digest.hex()
+
+    return digests[_id(node)].hex()
 
 
 # ═══════════════════════════════════════════
 # STRUCTURAL DIFF
 # ═══════════════════════════════════════════
 
-def diff(old, new, path="root"):
+def diff(old, new, path="root", memo=None):
     """Compute structural diff between two Xi node graphs.
 
     Returns a list of patch operations:
@@ -242,10 +277,15 @@ def diff(old, new, path="root"):
       {"op": "insert", "path": "root.children[2]", "new": ...}
       {"op": "delete", "path": "root.children[1]"}
       {"op": "modify_data", "path": "root", "old": ..., "new": ...}
+
+    Subtree hashes are memoized (see hash_node) so identical subtrees are
+    pruned without rehashing; pass memo to reuse hashes already computed.
     """
     ops = []
+    if memo is None:
+        memo = {}
 
-    if hash_node(old) == hash_node(new):
+    if old is new or hash_node(old, memo) == hash_node(new, memo):
         return ops  # Identical subtrees
 
     # Tag changed → full replace
@@ -253,7 +293,7 @@ def diff(old, new, path="root"):
         ops.append({
             "op": "replace",
             "path": path,
-            "old_hash": hash_node(old),
+            "old_hash": hash_node(old, memo),
             "new": _node_to_patch(new)
         })
         return ops
@@ -292,10 +332,10 @@ def diff(old, new, path="root"):
             ops.append({
                 "op": "delete",
                 "path": child_path,
-                "old_hash": hash_node(old.children[i])
+                "old_hash": hash_node(old.children[i], memo)
             })
         else:
-            ops.extend(diff(old.children[i], new.children[i], child_path))
+            ops.extend(diff(old.children[i], new.children[i], child_path, memo))
 
     return ops
 
@@ -330,20 +370,26 @@ def _data_repr(data):
 def patch(node, operations):
     """Apply a list of patch operations to a node graph.
 
-    Returns the patched node (original is not modified).
+    Returns the patched node (original is not modified). Each operation
+    copies the nodes along its path and edits the copies, so a node that
+    is shared elsewhere in the graph keeps its other uses unchanged.
     """
-    result = copy.deepcopy(node)
+    result = node
 
     for op in operations:
         path = op["path"]
-        parts = _parse_path(path)
+        indices = [p for p in _parse_path(path) if isinstance(p, int)]
 
         if op["op"] == "replace":
             new_node = _patch_to_node(op["new"])
-            result = _set_at_path(result, parts, new_node)
+            if not indices:
+                result = new_node
+            else:
+                result, parent = _copy_path(result, indices[:-1])
+                parent.children[indices[-1]] = new_node
 
         elif op["op"] == "modify_data":
-            target = _get_at_path(result, parts)
+            result, target = _copy_path(result, indices)
             new_data = op["new"]
             if isinstance(new_data, str) and new_data in NAMES_PRIMOP:
                 target.data = NAMES_PRIMOP[new_data]
@@ -351,25 +397,40 @@ def patch(node, operations):
                 target.data = new_data
 
         elif op["op"] == "insert":
-            parent_parts = parts[:-1]
-            idx = parts[-1]
-            parent = _get_at_path(result, parent_parts)
+            result, parent = _copy_path(result, indices[:-1])
             new_node = _patch_to_node(op["new"])
-            if isinstance(idx, int):
-                parent.children.insert(idx, new_node)
+            if indices:
+                parent.children.insert(indices[-1], new_node)
             else:
                 parent.children.append(new_node)
 
         elif op["op"] == "delete":
-            parent_parts = parts[:-1]
-            idx = parts[-1]
-            parent = _get_at_path(result, parent_parts)
-            if isinstance(idx, int) and idx < len(parent.children):
-                parent.children.pop(idx)
+            result, parent = _copy_path(result, indices[:-1])
+            if indices and indices[-1] < len(parent.children):
+                parent.children.pop(indices[-1])
 
     return result
 
 
+def _copy_path(root, indices):
+    """Copy every node from root down to root.children[i0].children[i1]...
+
+    Returns (new root, copy of the node at the end of the path).
+    """
+    root = current = _copy_node(root)
+    for idx in indices:
+        child = _copy_node(current.children[idx])
+        current.children[idx] = child
+        current = child
+    return root, current
+
+
+def _copy_node(node):
+    new = copy.copy(node)
+    new.children = list(node.children)
+    return new
+
+
 def _parse_path(path):
     """Parse 'root.children[0].children[1]' into ['root', 0, 1]."""
     parts = []
@@ -385,30 +446,6 @@ def _parse_path(path):
     return parts
 
 
-def _get_at_path(node, parts):
-    current = node
-    for p in parts:
-        if p == "root":
-            continue
-        if isinstance(p, int):
-            current = current.children[p]
-    return current
-
-
-def _set_at_path(node, parts, new_node):
-    if len(parts) <= 1:
-        return new_node
-    # Navigate to parent, replace child
-    indices = [p for p in parts if isinstance(p, int)]
-    if not indices:
-        return new_node
-    current = node
-    for idx in indices[:-1]:
-        current = current.children[idx]
-    current.children[indices[-1]] = new_node
-    return node
-
-
 def _patch_to_node(obj):
     """Convert a patch node representation back to Node."""
     return _convert_node(obj)
@@ -504,14 +541,51 @@ def _all_tags(node):
     return tags
 
 
-def node_count(node):
-    """Count total nodes in graph."""
-    count = 1
-    for c in node.children:
-        count += node_count(c)
+def node_count(node, memo=None):
+    """Count total nodes in graph (a shared node counts once per use).
+
+    memo, if given, is a dict keyed by id(node) that caches subtree sizes
+    across calls, so each distinct node is visited once however often it
+    is shared; like hash_node's memo it is only valid while the counted
+    graphs are alive and unchanged. Without it, a plain walk of the
+    unfolded tree is fastest.
+    """
+    if memo is not None:
+        return _node_count_memo(node, memo)
+    count = 0
+    stack = [node]
+    _pop, _extend = stack.pop, stack.extend
+    while stack:
+        count += 1
+        _extend(_pop().children)
     return count
 
 
+def _node_count_memo(node, sizes):
+    # Post-order: a node is sized once all its children are
+    stack = [node]
+    _push, _pop, _id = stack.append, stack.pop, id
+    while stack:
+        n = stack[-1]
+        if _id(n) in sizes:
+            _pop()
+            continue
+        children = n.children
+        pending = False
+        for c in children:
+            if _id(c) not in sizes:
+                _push(c)
+                pending = True
+        if pending:
+            continue
+        _pop()
+        total = 1
+        for c in children:
+            total += sizes[_id(c)]
+        sizes[_id(n)] = total
+    return sizes[_id(node)]
+
+
 def max_depth(node):
     """Max depth of graph."""
     if not node.children:
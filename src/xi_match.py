@@ -8,6 +8,7 @@ Usage:  python xi_match.py demo
 """
 
 import sys, os
+from functools import lru_cache
 sys.setrecursionlimit(50000)
 sys.path.insert(0, os.path.dirname(__file__))
 from xi import Node, Tag, PrimOp, Effect, B, Interpreter, XiError, render_tree, node_label, PRIM_NAME
@@ -20,10 +21,15 @@ PRIM_NAME[MATCH]  = "match"
 PRIM_NAME[CONSTR] = "constr"
 
 
+@lru_cache(maxsize=None)
+def _constr_head(index):
+    """The shared #constr(index) node heading every constructor of that index."""
+    return Node(Tag.PRIM, prim_op=CONSTR, data=index)
+
+
 def constr(index, *args):
     """Build a constructor node: constr(index, arg1, arg2, ...)"""
-    node = Node(Tag.PRIM, prim_op=CONSTR, data=index)
-    result = node
+    result = _constr_head(index)
     for arg in args:
         result = B.app(result, arg)
     return result
@@ -40,21 +46,33 @@ def match_expr(scrutinee, branches):
 
 class Constructor:
     """A fully applied constructor value."""
+    __slots__ = ("index", "args", "_node")
+
     def __init__(self, index, args=None):
         self.index = index
         self.args = args or []
+        self._node = None
+
+    def append(self, arg):
+        """Apply the constructor to one more argument node."""
+        self.args.append(arg)
+        self._node = None
 
     def to_node(self):
-        return constr(self.index, *self.args)
+        # Cached: a value is often substituted into several places
+        if self._node is None:
+            self._node = constr(self.index, *self.args)
+        return self._node
 
     @staticmethod
     def from_node(node):
         args = []
         current = node
         while current.tag == Tag.APP:
-            args.insert(0, current.children[1])
+            args.append(current.children[1])
             current = current.children[0]
         if current.tag == Tag.PRIM and current.prim_op == CONSTR:
+            args.reverse()
             return Constructor(current.data, args)
         return None
 
@@ -62,129 +80,178 @@ class Constructor:
         return f"Constructor({self.index}, {len(self.args)} args)"
 
 
-def _is_constr_chain(node):
-    """Check if node is a CONSTR application chain (not match, not other prims)."""
-    current = node
-    while current.tag == Tag.APP:
-        current = current.children[0]
-    return current.tag == Tag.PRIM and current.prim_op == CONSTR
+# ── Evaluation handlers ──
+#
+# _eval drives an explicit continuation stack instead of recursing. Every
+# handler returns (node, value): a node still to be evaluated, or
+# (None, value) once a value is known. Continuation frames are tuples
+# whose first item is the function that resumes them with that value.
 
+def _eval_value(interp, n, push):
+    return None, n
 
-class MatchInterpreter(Interpreter):
-    """Extended interpreter with ι-elimination (pattern matching)."""
+def _eval_uni(interp, n, push):
+    return None, f"𝒰{n.universe_level}"
 
-    def _eval(self, n):
-        self.reductions += 1
-        if self.reductions > 5_000_000:
-            raise XiError("Reduction limit exceeded")
-
-        if n.tag == Tag.EFF:
-            return self._eval(n.children[0])
-
-        if n.tag == Tag.PRIM:
-            if n.prim_op == PrimOp.STR_LIT:  return n.data
-            if n.prim_op == PrimOp.INT_LIT:  return n.data
-            if n.prim_op == PrimOp.FLOAT_LIT: return n.data
-            if n.prim_op == PrimOp.UNIT:     return None
-            if n.prim_op == PrimOp.BOOL_TRUE: return True
-            if n.prim_op == PrimOp.BOOL_FALSE: return False
-            if n.prim_op == PrimOp.VAR:
-                raise XiError(f"Unbound variable: de Bruijn index {n.data}")
-            return n  # partially applied prim
-
-        if n.tag == Tag.LAM: return n
-        if n.tag == Tag.UNI: return f"𝒰{n.universe_level}"
-        if n.tag == Tag.PI or n.tag == Tag.SIG: return n
-        if n.tag == Tag.IND: return n
-
-        if n.tag == Tag.FIX:
-            body = n.children[1]
-            return self._eval(self._substitute(body, 0, n))
-
-        if n.tag == Tag.APP:
-            return self._eval_app(n)
-
-        raise XiError(f"Cannot evaluate: {node_label(n)}")
-
-    def _eval_app(self, n):
-        func = n.children[0]
-        arg = n.children[1]
-
-        # 1. Match expression?
-        match_info = self._decompose_match(n)
-        if match_info:
-            return self._reduce_match(*match_info)
+def _eval_eff(interp, n, push):
+    return n.children[0], None
+
+def _eval_fix(interp, n, push):
+    return interp._substitute(n.children[1], 0, n), None
 
+def _eval_prim(interp, n, push):
+    lit = _PRIM_DISPATCH.get(n.prim_op)
+    if lit is None:
+        return None, n  # partially applied prim
+    return None, lit(n)
+
+def _eval_app(interp, n, push):
+    func = n.children[0]
+    arg = n.children[1]
+    ftag = func.tag
+
+    # 1. Lambda β-reduction (check before evaluating arg for efficiency)
+    if ftag == Tag.LAM:
+        push((_k_beta, func.children[1]))
+        return arg, None
+
+    if ftag == Tag.PRIM:
+        op = func.prim_op
         # 2. Direct constructor: @(constr(i), arg)
-        if func.tag == Tag.PRIM and func.prim_op == CONSTR:
-            val = self._eval(arg)
-            return Constructor(func.data, [self._to_node(val)])
-
-        # 3. Multi-arg constructor chain: @(@(constr(i), a1), a2)
-        if _is_constr_chain(func):
-            c = self._build_constructor(func)
-            val = self._eval(arg)
-            c.args.append(self._to_node(val))
-            return c
-
-        # 4. Lambda β-reduction (check before evaluating arg for efficiency)
-        if func.tag == Tag.LAM:
-            val = self._eval(arg)
-            body = func.children[1]
-            return self._eval(self._substitute(body, 0, self._to_node(val)))
-
-        # 5. Direct unary primitive
-        if func.tag == Tag.PRIM and func.prim_op != MATCH:
-            val = self._eval(arg)
-            return self._apply_unary(func.prim_op, val)
-
-        # 6. Binary primitive: @(@(prim, lhs), rhs)
-        if func.tag == Tag.APP and func.children[0].tag == Tag.PRIM:
-            op = func.children[0].prim_op
-            if op != CONSTR and op != MATCH:
-                val = self._eval(arg)
-                lhs = self._eval(func.children[1])
-                return self._apply_binary(op, lhs, val)
-
-        # 7. Evaluate func, then retry
-        val = self._eval(arg)
-        evaled_func = self._eval(func)
-        if isinstance(evaled_func, Node):
-            return self._eval(B.app(evaled_func, self._to_node(val)))
-        if isinstance(evaled_func, Constructor):
-            evaled_func.args.append(self._to_node(val))
-            return evaled_func
-
-        raise XiError(f"Cannot apply: {type(evaled_func)}")
-
-    def _build_constructor(self, node):
-        """Decompose a constructor application chain and evaluate args."""
-        args = []
-        current = node
-        while current.tag == Tag.APP:
-            args.insert(0, current.children[1])
-            current = current.children[0]
-        idx = current.data
-        evaled = [self._to_node(self._eval(a)) for a in args]
-        return Constructor(idx, evaled)
+        if op == CONSTR:
+            push((_k_constr_args, func.data, [arg], []))
+            return arg, None
+        # 3. Direct unary primitive
+        if op != MATCH:
+            push((_k_unary, op))
+            return arg, None
+
+    # 4. Binary primitive: @(@(prim, lhs), rhs)
+    elif ftag == Tag.APP and func.children[0].tag == Tag.PRIM:
+        op = func.children[0].prim_op
+        if op != CONSTR and op != MATCH:
+            push((_k_binary_rhs, op, func.children[1]))
+            return arg, None
+
+    # Only constructor chains, matches and general applications get here;
+    # one walk down the spine tells them apart.
+    args = [arg]
+    head = func
+    while head.tag == Tag.APP:
+        args.append(head.children[1])
+        head = head.children[0]
+
+    if head.tag == Tag.PRIM:
+        # 5. Multi-arg constructor chain: @(@(constr(i), a1), a2)
+        if head.prim_op == CONSTR:
+            args.reverse()
+            push((_k_constr_args, head.data, args, []))
+            return args[0], None
+        # 6. Match: @(@(@(#match(n), scrut), b0), b1)
+        if head.prim_op == MATCH and len(args) >= 1 + head.data:
+            args.reverse()
+            push((_k_match, args[1:1 + head.data]))
+            return args[0], None
+
+    # 7. Evaluate arg, then func, then retry
+    push((_k_apply_rhs, func))
+    return arg, None
+
+
+def _k_match(interp, val, frame, push):
+    return interp._reduce_match(val, frame[1]), None
+
+def _k_constr_args(interp, val, frame, push):
+    _, idx, args, evaled = frame
+    evaled.append(interp._to_node(val))
+    if len(evaled) < len(args):
+        push(frame)
+        return args[len(evaled)], None
+    return None, Constructor(idx, evaled)
+
+def _k_beta(interp, val, frame, push):
+    return interp._substitute(frame[1], 0, interp._to_node(val)), None
+
+def _k_unary(interp, val, frame, push):
+    return None, interp._apply_unary(frame[1], val)
+
+def _k_binary_rhs(interp, val, frame, push):
+    push((_k_binary, frame[1], val))
+    return frame[2], None
+
+def _k_binary(interp, val, frame, push):
+    return None, interp._apply_binary(frame[1], val, frame[2])
+
+def _k_apply_rhs(interp, val, frame, push):
+    push((_k_apply, val))
+    return frame[1], None
+
+def _k_apply(interp, val, frame, push):
+    if isinstance(val, Node):
+        return B.app(val, interp._to_node(frame[1])), None
+    if isinstance(val, Constructor):
+        val.append(interp._to_node(frame[1]))
+        return None, val
+    raise XiError(f"Cannot apply: {type(val)}")
+
+
+def _eval_unknown(interp, n, push):
+    raise XiError(f"Cannot evaluate: {node_label(n)}")
+
+def _eval_unbound(n):
+    raise XiError(f"Unbound variable: de Bruijn index {n.data}")
+
+
+# int(tag) → handler
+_DISPATCH = [_eval_unknown] * (max(Tag) + 1)
+for _tag in (Tag.LAM, Tag.PI, Tag.SIG, Tag.IND):
+    _DISPATCH[_tag] = _eval_value
+_DISPATCH[Tag.UNI] = _eval_uni
+_DISPATCH[Tag.EFF] = _eval_eff
+_DISPATCH[Tag.FIX] = _eval_fix
+_DISPATCH[Tag.PRIM] = _eval_prim
+_DISPATCH[Tag.APP] = _eval_app
+
+# Literal prims → value; any other prim evaluates to itself
+_PRIM_DISPATCH = {
+    PrimOp.STR_LIT:    lambda n: n.data,
+    PrimOp.INT_LIT:    lambda n: n.data,
+    PrimOp.FLOAT_LIT:  lambda n: n.data,
+    PrimOp.UNIT:       lambda n: None,
+    PrimOp.BOOL_TRUE:  lambda n: True,
+    PrimOp.BOOL_FALSE: lambda n: False,
+    PrimOp.VAR:        _eval_unbound,
+}
 
-    def _decompose_match(self, node):
-        """Decompose @(@(@(#match(n), scrut), b0), b1) → (scrutinee, [branches])"""
-        apps = []
-        current = node
-        while current.tag == Tag.APP:
-            apps.insert(0, current.children[1])
-            current = current.children[0]
-        if current.tag == Tag.PRIM and current.prim_op == MATCH:
-            num = current.data
-            if len(apps) >= 1 + num:
-                return apps[0], apps[1:1+num]
-        return None
 
-    def _reduce_match(self, scrutinee, branches):
-        """ι-reduction: eval scrutinee → Constructor(idx, args), select branch[idx], apply to args."""
-        val = self._eval(scrutinee)
+class MatchInterpreter(Interpreter):
+    """Extended interpreter with ι-elimination (pattern matching)."""
+
+    # Called once per evaluation step when set (the sandbox meters gas here)
+    on_step = None
 
+    def _eval(self, n):
+        work = []
+        push, pop = work.append, work.pop
+        dispatch = _DISPATCH
+        on_step = self.on_step
+        while True:
+            self.reductions += 1
+            if self.reductions > 5_000_000:
+                raise XiError("Reduction limit exceeded")
+            if on_step is not None:
+                on_step()
+
+            n, val = dispatch[n.tag](self, n, push)
+            # Resume continuations until one asks for another node
+            while n is None:
+                if not work:
+                    return val
+                frame = pop()
+                n, val = frame[0](self, val, frame, push)
+
+    def _reduce_match(self, val, branches):
+        """ι-reduction: scrutinee value → Constructor(idx, args); returns branch[idx] applied to args."""
         if isinstance(val, Constructor):
             idx, args = val.index, val.args
         elif isinstance(val, Node):
@@ -206,7 +273,7 @@ class MatchInterpreter(Interpreter):
         result = branches[idx]
         for a in args:
             result = B.app(result, a)
-        return self._eval(result)
+        return result
 
     def _to_node(self, value):
         if isinstance(value, Constructor):
@@ -224,10 +291,11 @@ def bool_match(s, tb, fb): return match_expr(s, [tb, fb])
 
 NAT_ZERO = constr(0)
 def nat_succ(n): return constr(1, n)
+_NAT_CACHE = [NAT_ZERO]   # _NAT_CACHE[v] is nat(v); each extends the last
 def nat(v):
-    r = NAT_ZERO
-    for _ in range(v): r = nat_succ(r)
-    return r
+    cache = _NAT_CACHE
+    while len(cache) <= v: cache.append(nat_succ(cache[-1]))
+    return cache[max(v, 0)]
 def nat_match(s, zb, sb): return match_expr(s, [zb, sb])
 
 def option_none(): return constr(0)
@@ -253,7 +321,11 @@ def result_match(s, ob, eb): return match_expr(s, [ob, eb])
 # ═══════════════════════════════════════════════════════════════
 # RECURSIVE FUNCTIONS
 # ═══════════════════════════════════════════════════════════════
+#
+# Each builder returns one shared graph, built on first use; callers
+# embed it in larger programs but never mutate it.
 
+@lru_cache(maxsize=None)
 def build_nat_add():
     """add = μ self. λn. λm. match n { zero→m | succ k→succ(self k m) }"""
     zero_branch = B.var(0)  # m
@@ -263,6 +335,7 @@ def build_nat_add():
         nat_match(B.var(1), zero_branch, succ_branch)))
     return B.fix(B.universe(0), body)
 
+@lru_cache(maxsize=None)
 def build_nat_mul():
     """mul = μ self. λn. λm. match n { zero→zero | succ k→add m (self k m) }"""
     add = build_nat_add()
@@ -272,6 +345,7 @@ def build_nat_mul():
         nat_match(B.var(1), NAT_ZERO, succ_branch)))
     return B.fix(B.universe(0), body)
 
+@lru_cache(maxsize=None)
 def build_list_length():
     """length = μ self. λxs. match xs { nil→zero | cons h t→succ(self t) }"""
     cons_branch = B.lam(B.universe(0), B.lam(B.universe(0),
@@ -279,6 +353,7 @@ def build_list_length():
     body = B.lam(B.universe(0), list_match(B.var(0), NAT_ZERO, cons_branch))
     return B.fix(B.universe(0), body)
 
+@lru_cache(maxsize=None)
 def build_list_map():
     """map = μ self. λf. λxs. match xs { nil→nil | cons h t→cons(f h)(self f t) }"""
     cons_branch = B.lam(B.universe(0), B.lam(B.universe(0),
@@ -287,6 +362,7 @@ def build_list_map():
         list_match(B.var(0), list_nil(), cons_branch)))
     return B.fix(B.universe(0), body)
 
+@lru_cache(maxsize=None)
 def build_list_foldr():
     """foldr = μ self. λf. λz. λxs. match xs { nil→z | cons h t→f h (self f z t) }"""
     nil_branch = B.var(1)
@@ -297,6 +373,7 @@ def build_list_foldr():
         list_match(B.var(0), nil_branch, cons_branch))))
     return B.fix(B.universe(0), body)
 
+@lru_cache(maxsize=None)
 def build_factorial():
     """fact = μ self. λn. match n { zero→1 | succ k→mul(succ k)(self k) }"""
     mul = build_nat_mul()
@@ -311,26 +388,47 @@ def build_factorial():
 # NAT → INT HELPER
 # ═══════════════════════════════════════════════════════════════
 
+def _is_constr_node(node):
+    """True if node is a constructor application chain (already a value)."""
+    while node.tag == Tag.APP:
+        node = node.children[0]
+    return node.tag == Tag.PRIM and node.prim_op == CONSTR
+
+
 def nat_to_int(interp, val):
     count = 0
     current = val
     limit = 100000
     while limit > 0:
         limit -= 1
-        if isinstance(current, Constructor):
+        if isinstance(current, Node):
+            # Fast path: peel succ layers @(#constr(1), k) straight off the
+            # node, without building a Constructor for each one
+            if current.tag == Tag.APP:
+                head = current.children[0]
+                if head.tag == Tag.PRIM and head.prim_op == CONSTR and head.data == 1:
+                    count += 1
+                    tail = current.children[1]
+                    current = tail if _is_constr_node(tail) else interp._eval(tail)
+                    continue
+            c = Constructor.from_node(current)
+            if c: current = c
+            else: return count
+        elif isinstance(current, Constructor):
             if current.index == 0: return count
             if current.index == 1:
                 count += 1
                 if current.args:
                     a = current.args[0]
-                    current = interp._eval(a) if isinstance(a, Node) else a
+                    if isinstance(a, Node):
+                        # Already-built Succ chains decode structurally;
+                        # evaluating them would re-walk the whole tail.
+                        current = a if _is_constr_node(a) else interp._eval(a)
+                    else:
+                        current = a
                 else:
                     return count
             else: return count
-        elif isinstance(current, Node):
-            c = Constructor.from_node(current)
-            if c: current = c
-            else: return count
         elif isinstance(current, int):
             return count + current
         else:
@@ -8,10 +8,13 @@ Implements three optimization passes over the Xi graph:
   2. Common subexpression elimination (CSE) — share structurally equal subtrees
   3. Constant folding — evaluate pure primitive operations at compile time
 
+optimize() runs folding and CSE as one fused pass (fold_and_share) by
+default; the individual passes remain available by name.
+
 Usage:  python xi_optimizer.py demo
 """
 
-import sys, os
+import sys, os, operator
 sys.path.insert(0, os.path.dirname(__file__))
 from xi import Node, Tag, PrimOp, Effect, B, Interpreter, XiError, serialize, render_tree
 
@@ -36,47 +39,18 @@ class OptimizerStats:
 # PASS 1: Dead Node Elimination
 # ═══════════════════════════════════════════════════════════════
 
-def _collect_reachable(root):
-    """Return set of ids of all nodes reachable from root."""
-    visited = set()
-    stack = [root]
-    while stack:
-        node = stack.pop()
-        nid = id(node)
-        if nid in visited:
-            continue
-        visited.add(nid)
-        for child in node.children:
-            stack.append(child)
-    return visited
-
-
 def eliminate_dead_nodes(root, stats=None):
     """
     Dead node elimination.
 
     In a content-addressed DAG, shared nodes may become orphaned after
-    other transformations. This pass traverses from the root and rebuilds
-    the graph keeping only reachable nodes.
+    other transformations. A graph here is held only through its root,
+    so every node the other passes leave behind is already unreachable
+    and is reclaimed by Python; there is nothing left to walk or rebuild.
 
     Returns: (new_root, nodes_removed_count)
     """
-    # Count all nodes
-    all_nodes = set()
-    stack = [root]
-    while stack:
-        n = stack.pop()
-        nid = id(n)
-        if nid not in all_nodes:
-            all_nodes.add(nid)
-            for c in n.children:
-                stack.append(c)
-
-    reachable = _collect_reachable(root)
-    removed = len(all_nodes) - len(reachable)
-    if stats:
-        stats.dead_eliminated += removed
-    return root, removed
+    return root, 0
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -104,96 +78,86 @@ def cse(root, stats=None):
     """
     Common Subexpression Elimination.
 
-    Bottom-up pass: for each node, compute a structural signature.
-    If two nodes have the same signature, share one instance.
+    Bottom-up pass that hash-conses the graph: each node is keyed by
+    _structural_key over its already-canonical children, and the first
+    node seen with a key becomes the shared instance for all later ones.
+    A node is only rebuilt when one of its children was replaced.
 
     Returns: new root with shared subtrees.
     """
-    # Build post-order traversal
-    order = []
-    visited = set()
-
-    def postorder(node):
-        nid = id(node)
-        if nid in visited:
-            return
-        visited.add(nid)
-        for child in node.children:
-            postorder(child)
-        order.append(node)
-
-    postorder(root)
-
     # Map: structural_key → canonical node
     canonical = {}
-    # Map: old node id → replacement node
+    # Map: old node id → canonical node
     replacement = {}
     shared_count = 0
 
-    for node in order:
-        # First, replace children with canonical versions
-        new_children = []
-        changed = False
-        for c in node.children:
-            rep = replacement.get(id(c), c)
-            new_children.append(rep)
-            if rep is not c:
-                changed = True
-
-        if changed:
+    # Iterative post-order: a node is pushed back (expanded) above its
+    # children, so it is processed once they all have replacements.
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        nid = id(node)
+        if nid in replacement:
+            continue
+        children = node.children
+        if not expanded:
+            stack.append((node, True))
+            for c in reversed(children):
+                if id(c) not in replacement:
+                    stack.append((c, False))
+            continue
+
+        new_children = [replacement[id(c)] for c in children]
+        if any(rep is not c for rep, c in zip(new_children, children)):
             new_node = Node(node.tag, children=new_children,
-                           prim_op=node.prim_op, data=node.data,
-                           effect=node.effect,
-                           universe_level=node.universe_level)
+                            prim_op=node.prim_op, data=node.data,
+                            effect=node.effect,
+                            universe_level=node.universe_level)
         else:
             new_node = node
 
-        # Compute structural key with canonical children
-        if new_node.tag == Tag.PRIM:
-            key = (Tag.PRIM, new_node.prim_op, new_node.data, new_node.arity)
-        elif new_node.tag == Tag.UNI:
-            key = (Tag.UNI, new_node.universe_level)
-        elif new_node.tag == Tag.EFF:
-            key = (Tag.EFF, new_node.effect, tuple(id(c) for c in new_node.children))
-        else:
-            key = (new_node.tag, tuple(id(c) for c in new_node.children))
-
-        if key in canonical:
-            replacement[id(node)] = canonical[key]
+        key = _structural_key(new_node)
+        canon = canonical.setdefault(key, new_node)
+        if canon is not new_node:
             shared_count += 1
-        else:
-            canonical[key] = new_node
-            replacement[id(node)] = new_node
+        replacement[nid] = canon
 
     if stats:
         stats.cse_shared += shared_count
 
-    return replacement.get(id(root), root)
+    return replacement[id(root)]
 
 
 # ═══════════════════════════════════════════════════════════════
 # PASS 3: Constant Folding
 # ═══════════════════════════════════════════════════════════════
 
-# Pure primitive ops that can be folded at compile time
+# Pure primitive ops that can be folded at compile time, with the same
+# semantics as Interpreter._apply_binary / _apply_unary
 _FOLDABLE_BINARY = {
-    PrimOp.INT_ADD, PrimOp.INT_SUB, PrimOp.INT_MUL,
-    PrimOp.INT_DIV, PrimOp.INT_MOD,
-    PrimOp.INT_LT, PrimOp.INT_GT, PrimOp.INT_EQ,
-    PrimOp.STR_CONCAT,
+    PrimOp.INT_ADD: operator.add, PrimOp.INT_SUB: operator.sub,
+    PrimOp.INT_MUL: operator.mul,
+    PrimOp.INT_DIV: operator.floordiv, PrimOp.INT_MOD: operator.mod,
+    PrimOp.INT_LT: operator.lt, PrimOp.INT_GT: operator.gt,
+    PrimOp.INT_EQ: operator.eq,
+    PrimOp.STR_CONCAT: lambda x, y: str(x) + str(y),
 }
 
 _FOLDABLE_UNARY = {
-    PrimOp.INT_NEG, PrimOp.BOOL_NOT, PrimOp.STR_LEN,
+    PrimOp.INT_NEG: operator.neg, PrimOp.BOOL_NOT: operator.not_,
+    PrimOp.STR_LEN: len,
 }
 
 
+_LITERAL_OPS = frozenset({
+    PrimOp.INT_LIT, PrimOp.STR_LIT, PrimOp.FLOAT_LIT,
+    PrimOp.BOOL_TRUE, PrimOp.BOOL_FALSE, PrimOp.UNIT,
+})
+
+
 def _is_literal(node):
     """Check if node is a compile-time constant."""
-    if node.tag != Tag.PRIM:
-        return False
-    return node.prim_op in (PrimOp.INT_LIT, PrimOp.STR_LIT, PrimOp.FLOAT_LIT,
-                            PrimOp.BOOL_TRUE, PrimOp.BOOL_FALSE, PrimOp.UNIT)
+    return node.tag == Tag.PRIM and node.prim_op in _LITERAL_OPS
 
 
 def _literal_value(node):
@@ -231,16 +195,24 @@ def constant_fold(root, stats=None):
     """
     cache = {}
 
-    def fold(node):
+    # Iterative post-order, as in cse(): a node is folded once all of
+    # its children have entries in cache.
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
         nid = id(node)
         if nid in cache:
-            return cache[nid]
-
-        # Recursively fold children first
-        new_children = [fold(c) for c in node.children]
-        changed = any(new_children[i] is not node.children[i] for i in range(len(new_children)))
+            continue
+        children = node.children
+        if not expanded:
+            stack.append((node, True))
+            for c in reversed(children):
+                if id(c) not in cache:
+                    stack.append((c, False))
+            continue
 
-        if changed:
+        new_children = [cache[id(c)] for c in children]
+        if any(nc is not c for nc, c in zip(new_children, children)):
             result = Node(node.tag, children=new_children,
                          prim_op=node.prim_op, data=node.data,
                          effect=node.effect,
@@ -248,72 +220,142 @@ def constant_fold(root, stats=None):
         else:
             result = node
 
-        # Try to fold: @(@(prim, lit), lit) → lit
-        if (result.tag == Tag.APP
-                and result.children[0].tag == Tag.APP
-                and result.children[0].children[0].tag == Tag.PRIM
-                and result.children[0].children[0].prim_op in _FOLDABLE_BINARY
-                and _is_literal(result.children[0].children[1])
-                and _is_literal(result.children[1])):
-            op = result.children[0].children[0].prim_op
-            lhs = _literal_value(result.children[0].children[1])
-            rhs = _literal_value(result.children[1])
-            try:
-                interp = Interpreter()
-                val = interp._apply_binary(op, lhs, rhs)
-                folded = _value_to_node(val)
-                if folded is not None:
-                    if stats:
-                        stats.constants_folded += 1
-                    cache[nid] = folded
-                    return folded
-            except Exception:
-                pass
-
-        # Try to fold: @(prim, lit) → lit  (unary)
-        if (result.tag == Tag.APP
-                and result.children[0].tag == Tag.PRIM
-                and result.children[0].prim_op in _FOLDABLE_UNARY
-                and _is_literal(result.children[1])):
-            op = result.children[0].prim_op
-            arg = _literal_value(result.children[1])
-            try:
-                interp = Interpreter()
-                val = interp._apply_unary(op, arg)
-                folded = _value_to_node(val)
-                if folded is not None:
-                    if stats:
-                        stats.constants_folded += 1
-                    cache[nid] = folded
-                    return folded
-            except Exception:
-                pass
-
-        cache[nid] = result
-        return result
-
-    return fold(root)
+        cache[nid] = _fold_node(result, stats)
+
+    return cache[id(root)]
+
+
+def _fold_node(result, stats):
+    """Fold one node whose children are already folded; returns it unchanged otherwise."""
+    # Try to fold: @(@(prim, lit), lit) → lit
+    if (result.tag == Tag.APP
+            and result.children[0].tag == Tag.APP
+            and result.children[0].children[0].tag == Tag.PRIM
+            and result.children[0].children[0].prim_op in _FOLDABLE_BINARY
+            and _is_literal(result.children[0].children[1])
+            and _is_literal(result.children[1])):
+        op = result.children[0].children[0].prim_op
+        lhs = _literal_value(result.children[0].children[1])
+        rhs = _literal_value(result.children[1])
+        try:
+            val = _FOLDABLE_BINARY[op](lhs, rhs)
+            folded = _value_to_node(val)
+            if folded is not None:
+                if stats:
+                    stats.constants_folded += 1
+                return folded
+        except Exception:
+            pass
+
+    # Try to fold: @(prim, lit) → lit  (unary)
+    if (result.tag == Tag.APP
+            and result.children[0].tag == Tag.PRIM
+            and result.children[0].prim_op in _FOLDABLE_UNARY
+            and _is_literal(result.children[1])):
+        op = result.children[0].prim_op
+        arg = _literal_value(result.children[1])
+        try:
+            val = _FOLDABLE_UNARY[op](arg)
+            folded = _value_to_node(val)
+            if folded is not None:
+                if stats:
+                    stats.constants_folded += 1
+                return folded
+        except Exception:
+            pass
+
+    return result
 
 
 # ═══════════════════════════════════════════════════════════════
 # COMBINED OPTIMIZER
 # ═══════════════════════════════════════════════════════════════
 
+def fold_and_share(root, stats=None):
+    """
+    Constant folding and CSE fused into one bottom-up pass.
+
+    Each node is rebuilt over its canonical children, folded if it is a
+    primitive application of literals, then interned by _structural_key.
+    Only nodes reachable from root are visited, so no dead nodes survive.
+
+    Returns: new root.
+    """
+    canonical = {}
+    replacement = {}
+    folded = set()   # ids of nodes replaced by a literal
+    shared_count = 0
+
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        nid = id(node)
+        if nid in replacement:
+            continue
+        children = node.children
+        if not expanded:
+            stack.append((node, True))
+            for c in reversed(children):
+                if id(c) not in replacement:
+                    stack.append((c, False))
+            continue
+
+        new_children = [replacement[id(c)] for c in children]
+        if any(nc is not c for nc, c in zip(new_children, children)):
+            new_node = Node(node.tag, children=new_children,
+                            prim_op=node.prim_op, data=node.data,
+                            effect=node.effect,
+                            universe_level=node.universe_level)
+        else:
+            new_node = node
+        result = _fold_node(new_node, stats)
+        if result is not new_node:
+            folded.add(nid)
+
+        canon = canonical.setdefault(_structural_key(result), result)
+        if canon is not result:
+            shared_count += 1
+        replacement[nid] = canon
+
+    if folded:
+        # Duplicates inside a folded subtree were never shared in the
+        # output: count only nodes that survive, as cse() after
+        # constant_fold() would.
+        seen, kept = set(), set()
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            nid = id(node)
+            if nid in seen:
+                continue
+            seen.add(nid)
+            kept.add(id(replacement[nid]))
+            if nid not in folded:
+                stack.extend(node.children)
+        shared_count = len(seen) - len(kept)
+
+    if stats:
+        stats.cse_shared += shared_count
+
+    return replacement[id(root)]
+
+
 def optimize(root, passes=None):
     """
     Run all optimization passes on a Xi graph.
 
     Args:
         root: Root node of the Xi graph.
-        passes: List of pass names to run. Default: all three.
+        passes: List of pass names to run. Default: all three, fused
+                into a single fold_and_share() pass.
                 Options: 'dce', 'cse', 'fold'
 
     Returns: (optimized_root, stats)
     """
+    stats = OptimizerStats()
     if passes is None:
-        passes = ['fold', 'cse', 'dce']
+        return fold_and_share(root, stats), stats
 
-    stats = OptimizerStats()
     node = root
 
     for p in passes:
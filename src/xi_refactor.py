@@ -21,13 +21,45 @@ Supported refactorings:
   - wrap_function: Add a wrapper around an expression
 """
 
-import json, copy
+import json, copy, re
+from collections import deque, OrderedDict
+from hashlib import blake2b
 from xi import Node, Tag, PrimOp, serialize
 from xi_compiler import Compiler
 from xi_match import MatchInterpreter, Constructor, nat_to_int
 from xi_json import diff, diff_stats, hash_node, to_json, canonicalize, node_count
 from xi_optimizer import optimize
-from xi_sandbox import SandboxedInterpreter, SandboxConfig
+
+
+_DEF_RE = re.compile(r'^\s*def\s+(\w+)')
+
+
+def _collect_refs(def_refs, root="main"):
+    """Names of every def reachable from root through def_refs (root included)."""
+    out = {root}
+    work = deque([root])
+    while work:
+        for name in def_refs.get(work.pop(), ()):
+            if name not in out:
+                out.add(name)
+                work.append(name)
+    return out
+
+
+def _contains_hash(roots, digest):
+    """True if any node reachable from roots has content hash digest."""
+    memo = {}
+    visited = set()
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        if hash_node(node, memo) == digest:
+            return True
+        stack.extend(node.children)
+    return False
 
 
 class RefactorResult:
@@ -41,15 +73,26 @@ class RefactorResult:
         self.verified = False
         self.original_result = None
         self.refactored_result = None
+        self._hash_memo = {}   # id(node) → digest, for hash_node
+        self._size_memo = {}   # id(node) → subtree size, for node_count
 
-    def verify(self, original_src, refactored_src):
-        """Verify that refactoring preserves semantics."""
-        c = Compiler()
-        sandbox = SandboxedInterpreter(SandboxConfig.strict())
+    def verify(self, original_src, refactored_src, engine=None, identical=False):
+        """Verify that refactoring preserves semantics.
+
+        Both programs are compiled and run through one engine: the caller's,
+        so its compile cache is reused, or else a fresh one. identical=True
+        means both sources compile to the same graph, so main is run only
+        once.
+        """
+        if engine is None:
+            engine = RefactoringEngine()
+        compiled, run = engine._compile_cached, engine.interp.run
 
         try:
-            self.original_result = c.run_program(original_src, "main")
-            self.refactored_result = c.run_program(refactored_src, "main")
+            self.original_result = run(compiled(original_src)["main"])
+            self.refactored_result = (
+                self.original_result if identical
+                else run(compiled(refactored_src)["main"]))
             self.verified = (str(self.original_result) == str(self.refactored_result))
         except Exception as e:
             self.verified = False
@@ -59,23 +102,51 @@ class RefactorResult:
     def to_dict(self):
         return {
             "description": self.description,
-            "original_hash": hash_node(self.original),
-            "refactored_hash": hash_node(self.refactored),
+            "original_hash": hash_node(self.original, self._hash_memo),
+            "refactored_hash": hash_node(self.refactored, self._hash_memo),
             "patch": self.patch_ops,
             "diff_stats": diff_stats(self.patch_ops),
             "verified": self.verified,
             "original_result": str(self.original_result) if self.original_result is not None else None,
             "refactored_result": str(self.refactored_result) if self.refactored_result is not None else None,
-            "original_nodes": node_count(self.original),
-            "refactored_nodes": node_count(self.refactored),
+            "original_nodes": node_count(self.original, self._size_memo),
+            "refactored_nodes": node_count(self.refactored, self._size_memo),
         }
 
 
 class RefactoringEngine:
     """AI-driven refactoring engine for Xi programs."""
 
+    # Compiled programs kept per engine, keyed by source digest
+    COMPILE_CACHE_SIZE = 256
+
     def __init__(self):
         self.compiler = Compiler()
+        self.interp = MatchInterpreter()
+        self._compile_cache = OrderedDict()
+
+    def _compile_cached(self, source):
+        """compile_program(source), reusing the result for repeated sources.
+
+        Compiled graphs are never mutated by the refactorings, so one
+        definitions dict can back every operation and verification that
+        sees the same source text.
+        """
+        return self._compile_refs_cached(source)[0]
+
+    def _compile_refs_cached(self, source):
+        """(definitions, def_refs) for source, cached like _compile_cached."""
+        key = blake2b(source.encode(), digest_size=16).digest()
+        cache = self._compile_cache
+        entry = cache.get(key)
+        if entry is not None:
+            cache.move_to_end(key)
+            return entry
+        entry = self.compiler.compile_program_refs(source)
+        cache[key] = entry
+        if len(cache) > self.COMPILE_CACHE_SIZE:
+            cache.popitem(last=False)
+        return entry
 
     def extract_function(self, source, expr_to_extract, new_name="extracted"):
         """Extract a subexpression into a named function.
@@ -87,19 +158,51 @@ class RefactoringEngine:
 
         Returns: RefactorResult with the patch
         """
-        # Build new source with extracted function
-        modified = f"def {new_name} = {expr_to_extract}\n{source}"
-        # Replace the expression in main with a call to the new function
-        modified = modified.replace(
-            expr_to_extract,
-            new_name,
-            1  # Only replace first occurrence after the def
-        )
-        # If the replacement happened inside the def itself, undo
-        if f"def {new_name} = {new_name}" in modified:
-            modified = f"def {new_name} = {expr_to_extract}\n" + source.replace(
-                expr_to_extract, new_name
-            )
+        defs = self._compile_cached(source)
+        if new_name in defs:
+            raise ValueError(f"'{new_name}' is already defined")
+        # Compile the expression in the program's scope and find it in the
+        # graph by content hash before touching any text
+        try:
+            target = self._compile_cached(
+                f"{source}\ndef {new_name} = {expr_to_extract}")[new_name]
+        except Exception as e:
+            raise ValueError(f"Cannot extract '{expr_to_extract}': {e}")
+        if not _contains_hash(defs.values(), hash_node(target)):
+            raise ValueError(f"'{expr_to_extract}' does not occur in the program")
+
+        # Rewrite the occurrences as whole tokens (not inside a longer
+        # identifier), and put the new def before the first def using it
+        pattern = re.compile(
+            r"(?<![\w'])" + r"\s+".join(map(re.escape, expr_to_extract.split()))
+            + r"(?![\w'])")
+        lines = source.split('\n')
+        def_start = 0
+        insert_at = None
+        for i, line in enumerate(lines):
+            if _DEF_RE.match(line):
+                def_start = i
+            lines[i], n = pattern.subn(new_name, line)
+            if n and insert_at is None:
+                insert_at = def_start
+        if insert_at is None:
+            raise ValueError(f"'{expr_to_extract}' does not occur in the program")
+        lines.insert(insert_at, f"def {new_name} = {expr_to_extract}")
+        modified = '\n'.join(lines)
+
+        # A correct extraction compiles every def to the same graph. A
+        # textual match that is not the extracted subtree (2 * k + 4 when
+        # extracting k + 4) changes some def, so reject it
+        try:
+            new_defs = self._compile_cached(modified)
+        except Exception as e:
+            raise ValueError(f"Cannot extract '{expr_to_extract}': {e}")
+        memo = {}
+        for name, node in defs.items():
+            if (name not in new_defs or
+                    hash_node(new_defs[name], memo) != hash_node(node, memo)):
+                raise ValueError(
+                    f"Extracting '{expr_to_extract}' would change def {name}")
 
         return self._make_result(source, modified,
                                  f"Extract '{expr_to_extract}' into def {new_name}")
@@ -113,13 +216,14 @@ class RefactoringEngine:
 
         Returns: RefactorResult
         """
-        # Parse to find the function body
+        # One pass: pull out the def line, keep every other line as is
         lines = source.strip().split('\n')
         func_body = None
         remaining = []
         for line in lines:
-            stripped = line.strip()
-            if stripped.startswith(f"def {func_name} ") or stripped.startswith(f"def {func_name}="):
+            m = _DEF_RE.match(line)
+            if m and m.group(1) == func_name:
+                stripped = line.strip()
                 # Extract body (after the =)
                 eq_pos = stripped.index('=')
                 body_start = stripped[eq_pos + 1:].strip()
@@ -140,7 +244,12 @@ class RefactoringEngine:
         if func_body is None:
             raise ValueError(f"Function '{func_name}' not found")
 
-        modified = '\n'.join(remaining).replace(func_name, f"({func_body})")
+        # Whole identifiers only: inlining f must leave f2 and self_f alone.
+        # The replacement is a function so backslashes in the body (\x. …)
+        # are not read as escapes.
+        inlined = f"({func_body})"
+        modified = re.sub(rf"\b{re.escape(func_name)}\b", lambda _: inlined,
+                          '\n'.join(remaining))
 
         return self._make_result(source, modified,
                                  f"Inline function '{func_name}'")
@@ -151,44 +260,28 @@ class RefactoringEngine:
         Returns: RefactorResult
         """
         lines = source.strip().split('\n')
-        defs = {}
-        main_line = None
-
-        for line in lines:
-            stripped = line.strip()
-            if stripped.startswith("def "):
-                parts = stripped.split()
-                name = parts[1]
-                defs[name] = stripped
-                if name == "main":
-                    main_line = stripped
-
-        if not main_line:
+        defs, def_refs = self._compile_refs_cached(source)
+        if "main" not in defs:
             raise ValueError("No 'main' definition found")
 
-        # Find reachable defs (simple: check if name appears in main or other reachable)
-        reachable = {"main"}
-        changed = True
-        while changed:
-            changed = False
-            for name in list(reachable):
-                defn = defs.get(name, "")
-                for other_name in defs:
-                    if other_name not in reachable and other_name in defn:
-                        reachable.add(other_name)
-                        changed = True
+        # The parser records which defs each body names. Node identity
+        # cannot stand in for that: numerals and constructors are shared
+        # nodes, so def z = Zero has the same node as every other Zero.
+        reachable = _collect_refs(def_refs)
 
         # Keep only reachable + imports
         kept = []
+        declared = set()
         for line in lines:
             stripped = line.strip()
+            m = _DEF_RE.match(line)
             if stripped.startswith("import "):
                 kept.append(line)
             elif stripped.startswith("type "):
                 kept.append(line)
-            elif stripped.startswith("def "):
-                name = stripped.split()[1]
-                if name in reachable:
+            elif m:
+                declared.add(m.group(1))
+                if m.group(1) in reachable:
                     kept.append(line)
             elif stripped.startswith("--") or stripped == "":
                 pass  # Skip comments and blank lines
@@ -196,7 +289,7 @@ class RefactoringEngine:
                 kept.append(line)
 
         modified = '\n'.join(kept)
-        removed = set(defs.keys()) - reachable
+        removed = declared - reachable
         desc = f"Dead code elimination: removed {', '.join(sorted(removed))}" if removed else "No dead code found"
 
         return self._make_result(source, modified, desc)
@@ -206,14 +299,16 @@ class RefactoringEngine:
 
         Returns: RefactorResult
         """
-        node = self.compiler.compile_program(source).get("main")
+        node = self._compile_cached(source).get("main")
         if not node:
             raise ValueError("No 'main' found")
 
         optimized, stats = optimize(node)
-        ops = diff(node, optimized)
-
         folds = getattr(stats, 'constants_folded', 0)
+        # Without a fold the optimizer only shares equal subgraphs, which
+        # leaves the tree, and so the diff, unchanged
+        ops = diff(node, optimized) if folds else []
+
         result = RefactorResult(node, optimized, ops,
                                 f"Constant folding: {folds} folds")
         return result
@@ -232,8 +327,9 @@ class RefactoringEngine:
         lines = source.strip().split('\n')
         new_lines = []
         for line in lines:
-            stripped = line.strip()
-            if stripped.startswith("def main"):
+            m = _DEF_RE.match(line)
+            if m and m.group(1) == "main":
+                stripped = line.strip()
                 eq_pos = stripped.index('=')
                 body = stripped[eq_pos + 1:].strip()
                 new_body = f"if {condition} then {body} else {fallback}"
@@ -257,17 +353,21 @@ class RefactoringEngine:
     def _make_result(self, original_src, modified_src, description):
         """Compile both versions, compute diff, verify."""
         try:
-            orig_node = self.compiler.compile_program(original_src).get("main")
-            mod_node = self.compiler.compile_program(modified_src).get("main")
+            orig_node = self._compile_cached(original_src).get("main")
+            mod_node = self._compile_cached(modified_src).get("main")
         except Exception as e:
             raise ValueError(f"Compilation failed: {e}")
 
         if not orig_node or not mod_node:
             raise ValueError("Both versions must have 'main'")
 
-        ops = diff(orig_node, mod_node)
-        result = RefactorResult(orig_node, mod_node, ops, description)
-        result.verify(original_src, modified_src)
+        result = RefactorResult(orig_node, mod_node, [], description)
+        memo = result._hash_memo
+        if hash_node(orig_node, memo) == hash_node(mod_node, memo):
+            result.verify(original_src, modified_src, engine=self, identical=True)
+        else:
+            result.patch_ops = diff(orig_node, mod_node)
+            result.verify(original_src, modified_src, engine=self)
         return result
 
 
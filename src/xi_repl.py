@@ -11,6 +11,7 @@ Usage:
 """
 
 import sys, os, readline
+from collections import OrderedDict, deque
 sys.path.insert(0, os.path.dirname(__file__))
 
 from xi import Node, Tag, PrimOp, Effect, B, Interpreter, render_tree, serialize, hexdump, XiError
@@ -59,15 +60,46 @@ HELP = """
   Multi-line: end a line with \\ to continue on next line.
 """
 
+# :hex dumps at most this many bytes of a serialized graph
+_HEX_LIMIT = 4096
+
+# Lines kept in readline history (in memory and in ~/.xi_history) and
+# inputs kept in Repl.history
+_HISTORY_LENGTH = 10000
+
+
+def _graph_size(root):
+    """Distinct nodes in a graph: the node table serialize() would write."""
+    seen = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if id(node) not in seen:
+            seen.add(id(node))
+            stack.extend(node.children)
+    return len(seen)
+
 
 class Repl:
     def __init__(self):
         self.interp = MatchInterpreter()
         self.tc = TypeChecker()
         self.definitions = {}  # name → Node (persistent across inputs)
+        self.def_types = {}    # name → resolved type, or None if untypable
         self.constructors = dict(KNOWN_CONSTRUCTORS)  # includes user types
+        self._index_constructors()
         self.imported = set()
-        self.history = []
+        self.history = deque(maxlen=_HISTORY_LENGTH)
+        self._compiled = OrderedDict()  # expression source → graph
+
+    # Compiled expressions kept until the next def/import/type/:reset
+    COMPILE_CACHE_SIZE = 512
+
+    def _index_constructors(self):
+        """Rebuild (index, arity) → name; the first name registered wins."""
+        self._ctor_by_tag = {}
+        for name, key in self.constructors.items():
+            self._ctor_by_tag.setdefault(key, name)
 
     def _make_parser(self, tokens):
         """Create a parser pre-loaded with current definitions and constructors."""
@@ -78,10 +110,21 @@ class Repl:
         return p
 
     def compile_expr(self, source):
-        """Compile expression with access to all definitions."""
+        """Compile expression with access to all definitions.
+
+        Graphs are cached per source text until the definitions or
+        constructors change; evaluation never mutates them.
+        """
+        graph = self._compiled.get(source)
+        if graph is not None:
+            self._compiled.move_to_end(source)
+            return graph
         tokens = tokenize(source)
         parser = self._make_parser(tokens)
-        return parser.parse_single()
+        graph = self._compiled[source] = parser.parse_single()
+        if len(self._compiled) > self.COMPILE_CACHE_SIZE:
+            self._compiled.popitem(last=False)
+        return graph
 
     def display_result(self, result):
         if result is None:
@@ -93,12 +136,12 @@ class Repl:
                 pass
             if isinstance(result, Constructor):
                 # Try to display constructor name
-                for name, (idx, ar) in KNOWN_CONSTRUCTORS.items():
-                    if idx == result.tag and ar == len(result.args):
-                        if result.args:
-                            args = ' '.join(self.display_result(a) for a in result.args)
-                            return f"{name} {args}"
-                        return name
+                name = self._ctor_by_tag.get((result.index, len(result.args)))
+                if name is not None:
+                    if result.args:
+                        args = ' '.join(self.display_result(a) for a in result.args)
+                        return f"{name} {args}"
+                    return name
         if isinstance(result, bool):
             return "True" if result else "False"
         return str(result)
@@ -124,13 +167,31 @@ class Repl:
         for p in reversed(params):
             body = B.lam(B.universe(0), body)
         self.definitions[name] = body
-        # Try to infer type
-        try:
-            ty = resolve_type(self.tc.infer(Context(), body))
+        self.def_types.pop(name, None)
+        self._compiled.clear()
+        ty = self.def_type(name)
+        if ty is not None:
             print(f"  {name} : {type_to_str(ty)} defined")
-        except Exception:
+        else:
             print(f"  {name} defined")
 
+    def def_type(self, name):
+        """Inferred type of a definition, or None; inferred once per binding.
+
+        Other definitions are inlined by node, so rebinding a name never
+        changes the type of a definition that used the old binding.
+        """
+        try:
+            return self.def_types[name]
+        except KeyError:
+            pass
+        try:
+            ty = resolve_type(self.tc.infer(Context(), self.definitions[name]))
+        except Exception:
+            ty = None
+        self.def_types[name] = ty
+        return ty
+
     def handle_import(self, source):
         """Handle import declaration."""
         tokens = tokenize(source)
@@ -143,6 +204,8 @@ class Repl:
         defs = load_import(name)
         for k, v in defs.items():
             self.definitions[k] = v
+            self.def_types.pop(k, None)
+        self._compiled.clear()
         self.imported.add(name)
         print(f"  Imported {name} ({len(defs)} definitions)")
 
@@ -155,6 +218,8 @@ class Repl:
         for k, v in parser.constructors.items():
             if k not in self.constructors:
                 self.constructors[k] = v
+                self._ctor_by_tag.setdefault(v, k)
+                self._compiled.clear()
                 print(f"  Constructor {k} registered")
 
     def cmd_eval(self, source):
@@ -171,7 +236,9 @@ class Repl:
         graph = self.compile_expr(source)
         binary = serialize(graph)
         print(f"  {len(binary)} bytes:")
-        print(hexdump(binary))
+        print(hexdump(binary[:_HEX_LIMIT]))
+        if len(binary) > _HEX_LIMIT:
+            print(f"  … {len(binary) - _HEX_LIMIT} more bytes")
 
     def cmd_type(self, source):
         graph = self.compile_expr(source)
@@ -184,25 +251,73 @@ class Repl:
 
     def cmd_opt(self, source):
         graph = self.compile_expr(source)
-        before = len(serialize(graph))
+        before = _graph_size(graph)
         opt, stats = optimize(graph)
-        after = len(serialize(opt))
+        after = _graph_size(opt)
         result = self.interp.run(opt)
         print(f"  Result: {self.display_result(result)}")
-        print(f"  Size:   {before} → {after} bytes ({100*(before-after)//max(before,1)}% reduction)")
+        print(f"  Size:   {before} → {after} nodes ({100*(before-after)//max(before,1)}% reduction)")
         print(f"  Stats:  {stats}")
 
+    def cmd_help(self):
+        print(HELP)
+
+    def cmd_reset(self):
+        self.definitions.clear()
+        self.def_types.clear()
+        self._compiled.clear()
+        self.constructors = dict(KNOWN_CONSTRUCTORS)
+        self._index_constructors()
+        self.imported.clear()
+        print("  Definitions cleared.")
+
     def cmd_defs(self):
         if not self.definitions:
             print("  No definitions.")
             return
-        for name, node in self.definitions.items():
-            try:
-                ty = resolve_type(self.tc.infer(Context(), node))
+        for name in self.definitions:
+            ty = self.def_type(name)
+            if ty is not None:
                 print(f"  {name} : {type_to_str(ty)}")
-            except Exception:
+            else:
                 print(f"  {name}")
 
+    # Command word → (handler, takes an argument). A command given without
+    # its argument, or with one it does not take, is read as an expression.
+    COMMANDS = {
+        ":help":  (cmd_help, False),
+        ":defs":  (cmd_defs, False),
+        ":reset": (cmd_reset, False),
+        ":tree":  (cmd_tree, True),
+        ":hex":   (cmd_hex, True),
+        ":type":  (cmd_type, True),
+        ":hash":  (cmd_hash, True),
+        ":opt":   (cmd_opt, True),
+    }
+
+    # Declaration keyword → handler, which parses the whole input
+    DECLARATIONS = {
+        "def":    handle_def,
+        "import": handle_import,
+        "type":   handle_type,
+    }
+
+    def dispatch(self, source):
+        """Run one (stripped, non-empty) input line other than :quit."""
+        word, sep, arg = source.partition(' ')
+        entry = self.COMMANDS.get(word)
+        if entry is not None:
+            handler, takes_arg = entry
+            if takes_arg and sep:
+                return handler(self, arg)
+            if not takes_arg and not sep:
+                return handler(self)
+        elif sep:
+            handler = self.DECLARATIONS.get(word)
+            if handler is not None:
+                return handler(self, source)
+        self.cmd_eval(source)
+
     def read_input(self):
         """Read input with multi-line continuation (trailing \\)."""
         try:
@@ -230,15 +345,49 @@ class Repl:
 
         return full
 
-    def run(self):
-        print(BANNER)
-
-        # Setup readline history
-        histfile = os.path.expanduser("~/.xi_history")
+    def _open_history(self, histfile):
+        """Load readline history from histfile, keeping the newest lines."""
+        self._histfile = histfile
+        readline.set_history_length(_HISTORY_LENGTH)   # caps the file only
         try:
             readline.read_history_file(histfile)
         except FileNotFoundError:
-            pass
+            try:
+                open(histfile, 'wb').close()   # append_history_file needs it
+            except OSError:
+                pass
+        # An older, longer file is cut down here in one pass rather than
+        # an entry at a time on the first command
+        length = readline.get_current_history_length()
+        if length > _HISTORY_LENGTH:
+            keep = [readline.get_history_item(i)
+                    for i in range(length - _HISTORY_LENGTH + 1, length + 1)]
+            readline.clear_history()
+            for line in keep:
+                readline.add_history(line)
+        self._hist_saved = readline.get_current_history_length()
+
+    def _record_history(self, source):
+        """Note one accepted input in Repl.history and the history file."""
+        self.history.append(source)
+        # A multi-line input adds one readline entry per line
+        length = readline.get_current_history_length()
+        # GNU readline: append each command as it is accepted instead of
+        # rewriting the whole file on exit (libedit lacks append_history_file)
+        append_history = getattr(readline, 'append_history_file', None)
+        if append_history is not None and length > self._hist_saved:
+            try:
+                append_history(length - self._hist_saved, self._histfile)
+            except OSError:
+                pass
+        for _ in range(length - _HISTORY_LENGTH):
+            readline.remove_history_item(0)
+        self._hist_saved = min(length, _HISTORY_LENGTH)
+
+    def run(self):
+        print(BANNER)
+
+        self._open_history(os.path.expanduser("~/.xi_history"))
 
         while True:
             source = self.read_input()
@@ -250,42 +399,13 @@ class Repl:
             if not source:
                 continue
 
-            self.history.append(source)
+            self._record_history(source)
 
             try:
-                # Commands
                 if source in (":quit", ":q", ":exit"):
                     print("  Bye!")
                     break
-                elif source == ":help":
-                    print(HELP)
-                elif source == ":defs":
-                    self.cmd_defs()
-                elif source == ":reset":
-                    self.definitions.clear()
-                    self.constructors = dict(KNOWN_CONSTRUCTORS)
-                    self.imported.clear()
-                    print("  Definitions cleared.")
-                elif source.startswith(":tree "):
-                    self.cmd_tree(source[6:])
-                elif source.startswith(":hex "):
-                    self.cmd_hex(source[5:])
-                elif source.startswith(":type "):
-                    self.cmd_type(source[6:])
-                elif source.startswith(":hash "):
-                    self.cmd_hash(source[6:])
-                elif source.startswith(":opt "):
-                    self.cmd_opt(source[5:])
-                # Definitions / imports / type declarations
-                elif source.startswith("def "):
-                    self.handle_def(source)
-                elif source.startswith("import "):
-                    self.handle_import(source)
-                elif source.startswith("type "):
-                    self.handle_type(source)
-                # Expression
-                else:
-                    self.cmd_eval(source)
+                self.dispatch(source)
 
             except (ParseError, LexError) as e:
                 print(f"  Parse error: {e}")
@@ -299,10 +419,11 @@ class Repl:
                 print(f"  Error: {type(e).__name__}: {e}")
 
         # Save history
-        try:
-            readline.write_history_file(histfile)
-        except Exception:
-            pass
+        if not hasattr(readline, 'append_history_file'):
+            try:
+                readline.write_history_file(self._histfile)
+            except Exception:
+                pass
 
 
 def run_demo():
@@ -319,16 +440,8 @@ def run_demo():
         nonlocal passed, failed
         print(f"  Ξ> {source}")
         try:
-            if is_def:
-                repl.handle_def(source)
-                passed += 1
-            elif source.startswith(":"):
-                cmd = source.split()[0]
-                rest = source[len(cmd):].strip()
-                if cmd == ":tree": repl.cmd_tree(rest)
-                elif cmd == ":type": repl.cmd_type(rest)
-                elif cmd == ":opt": repl.cmd_opt(rest)
-                elif cmd == ":defs": repl.cmd_defs()
+            if is_def or source.startswith(":"):
+                repl.dispatch(source)
                 passed += 1
             else:
                 graph = repl.compile_expr(source)
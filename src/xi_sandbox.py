@@ -106,6 +106,14 @@ class SandboxedInterpreter:
     def __init__(self, config=None):
         self.config = config or SandboxConfig.default()
         self.interp = MatchInterpreter()
+        self.reset()
+
+    def reset(self):
+        """Start fresh stats so the sandbox can evaluate another program.
+
+        Config and interpreter are kept; stats dicts returned by earlier
+        runs are left untouched.
+        """
         self.stats = {
             "steps": 0,
             "max_nodes": 0,
@@ -137,10 +145,9 @@ class SandboxedInterpreter:
         self.stats["steps"] = 0
 
         # Instrument interpreter to count steps
-        orig_eval = self.interp._eval
         sandbox_ref = self
 
-        def counted_eval(n):
+        def count_step():
             sandbox_ref.stats["steps"] += 1
             if sandbox_ref.stats["steps"] > sandbox_ref.config.gas:
                 raise GasExhausted(sandbox_ref.config.gas)
@@ -148,10 +155,9 @@ class SandboxedInterpreter:
                 elapsed = time.monotonic() - start
                 if elapsed > sandbox_ref.config.timeout_seconds:
                     raise TimeoutError(sandbox_ref.config.timeout_seconds)
-            return orig_eval(n)
 
         try:
-            self.interp._eval = counted_eval
+            self.interp.on_step = count_step
             result = self.interp.run(node)
         except SandboxError:
             raise
@@ -160,7 +166,7 @@ class SandboxedInterpreter:
             self.stats["exit_code"] = 2
             raise
         finally:
-            self.interp._eval = orig_eval
+            self.interp.on_step = None
 
         elapsed = time.monotonic() - start
         self.stats["wall_time_ms"] = round(elapsed * 1000, 2)
@@ -13,6 +13,7 @@ Usage:
 import sys, os
 sys.path.insert(0, os.path.dirname(__file__))
 from xi import Node, Tag, PrimOp, Effect, B, TAG_SYMBOL, PRIM_NAME, EFFECT_NAME, node_label
+from xi_match import MATCH
 
 
 class TypeErr(Exception):
@@ -144,7 +145,7 @@ def unify(a, b):
     if is_tvar(a):
         tv = a.tvar.resolve()
         if isinstance(tv, TypeVar):
-            if occurs_in(a, b):
+            if occurs_in(tv, b):
                 raise TypeErr(f"Infinite type: {a.tvar.name} occurs in {type_to_str(b)}")
             tv.bound = b
             return
@@ -153,7 +154,7 @@ def unify(a, b):
     if is_tvar(b):
         tv = b.tvar.resolve()
         if isinstance(tv, TypeVar):
-            if occurs_in(b, a):
+            if occurs_in(tv, a):
                 raise TypeErr(f"Infinite type: {b.tvar.name} occurs in {type_to_str(a)}")
             tv.bound = a
             return
@@ -220,6 +221,8 @@ PRIM_TYPES = {
 # ═══════════════════════════════════════════════════════════════
 
 def substitute(node, idx, val):
+    if isinstance(node, TypeVarNode):
+        return node  # no de Bruijn variables inside; keep the binding
     if node.tag == Tag.PRIM and node.prim_op == PrimOp.VAR:
         if node.data == idx: return val
         elif node.data > idx:
@@ -301,6 +304,10 @@ class TypeChecker:
         self.verbose = verbose
         self.checks = 0
 
+    def reset(self):
+        """Clear per-program counters so one checker can serve many programs."""
+        self.checks = 0
+
     def infer(self, ctx, node):
         """Infer the type of node in context ctx.
         ctx can be a Context object or a list (for backwards compat)."""
@@ -326,6 +333,9 @@ class TypeChecker:
             return B.universe(node.universe_level + 1)
 
         if node.tag == Tag.APP:
+            ty = self._infer_if(ctx, node)
+            if ty is not None:
+                return ty
             ft = resolve_type(normalize(self.infer(ctx, node.children[0])))
 
             if ft.tag == Tag.PI:
@@ -401,6 +411,33 @@ class TypeChecker:
 
         raise TypeErr(f"Cannot infer type of: {node_label(node)}", node)
 
+    def _infer_if(self, ctx, node):
+        """Type of a two-branch match on a Bool (if/then/else), else None.
+
+        Both branches of such a match are plain values, so the match has
+        their common type. Other matches are left to the generic rule.
+        """
+        args = []
+        head = node
+        while head.tag == Tag.APP:
+            args.append(head.children[1])
+            head = head.children[0]
+        if not (head.tag == Tag.PRIM and head.prim_op == MATCH
+                and head.data == 2 and len(args) == 3):
+            return None
+        else_br, then_br, scrut = args
+        scrut_ty = resolve_type(normalize(self.infer(ctx, scrut)))
+        if scrut_ty.tag != Tag.IND or scrut_ty.data != TYPE_BOOL.data:
+            return None
+        then_ty = self.infer(ctx, then_br)
+        else_ty = self.infer(ctx, else_br)
+        try:
+            unify(then_ty, else_ty)
+        except TypeErr:
+            # e.g. one branch carries an effect: no single type to report
+            return fresh_tvar()
+        return resolve_type(then_ty)
+
     def check(self, ctx, node, expected):
         self.checks += 1
         if isinstance(ctx, list):
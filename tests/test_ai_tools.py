@@ -64,6 +64,26 @@ class TestJsonIR:
         assert h1 == h2
         assert len(h1) == 64
 
+    def test_hash_memo_matches_plain(self):
+        node = self._compile("(λx. x * x) (3 + 4)")
+        memo = {}
+        assert hash_node(node, memo) == hash_node(node)
+        assert memo[id(node)] == hash_node(node)
+
+    def test_hash_deep_graph(self):
+        from xi import B
+        chain = B.int_lit(0)
+        for i in range(2000):
+            chain = B.app(B.app(B.prim(PrimOp.INT_ADD), chain), B.int_lit(i))
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(1000)   # shallower than the graph
+        try:
+            h = hash_node(chain)
+            n = node_count(chain)
+        finally:
+            sys.setrecursionlimit(limit)
+        assert len(h) == 64 and n == 8001
+
     def test_hash_different_programs(self):
         a = self._compile("2 + 3")
         b = self._compile("2 * 3")
@@ -79,6 +99,17 @@ class TestJsonIR:
         node = self._compile("42")
         assert node_count(node) >= 1
 
+    def test_node_count_memo_shared_dag(self):
+        from xi import B
+        x = B.int_lit(1)
+        for _ in range(12):
+            x = B.app(B.app(B.prim(PrimOp.INT_ADD), x), x)
+        memo = {}
+        assert node_count(x, memo) == node_count(x)
+        for _ in range(48):   # far too many paths to walk one by one
+            x = B.app(B.app(B.prim(PrimOp.INT_ADD), x), x)
+        assert node_count(x, memo) == 2 ** 62 - 3
+
     def test_max_depth(self):
         node = self._compile("42")
         assert max_depth(node) >= 0
@@ -130,6 +161,23 @@ class TestDiff:
         assert "total_ops" in stats
         assert stats["total_ops"] == len(ops)
 
+    @pytest.mark.parametrize("old,new", [
+        ("Pair Zero Zero", "Pair Zero Succ"),
+        ("Pair (Succ Zero) Zero", "Pair (Succ Zero) (Succ Zero)"),
+        ("Cons 1 (Cons 2 Nil)", "Cons 1 (Cons 3 Nil)"),
+        ("nat_of_int 3", "nat_of_int 4"),
+    ])
+    def test_patch_roundtrip_shared_nodes(self, old, new):
+        # Constructor heads and numerals are shared nodes: editing one use
+        # must leave the others alone
+        a = self._compile(old)
+        b = self._compile(new)
+        before = hash_node(a)
+        patched = patch(a, diff(a, b))
+        assert hash_node(patched) == hash_node(b)
+        assert hash_node(a) == before
+        assert hash_node(self._compile(old)) == before
+
 
 # ═══════════════════════════════════════════
 # SANDBOX
@@ -161,6 +209,14 @@ class TestSandbox:
         assert stats["exit_code"] != 0
         assert "Gas exhausted" in stats["error"]
 
+    def test_reset_reuses_sandbox(self):
+        sandbox = SandboxedInterpreter(SandboxConfig(gas=50, timeout_seconds=2.0))
+        _, first = sandbox.eval_safe(self._compile("def main = fix f. f"))
+        sandbox.reset()
+        result, second = sandbox.eval_safe(self._compile("def main = 2 + 3"))
+        assert result == 5 and second["exit_code"] == 0
+        assert "Gas exhausted" in first["error"]
+
     def test_strict_config(self):
         config = SandboxConfig.strict()
         assert config.gas == 10_000
@@ -202,6 +258,166 @@ class TestEvalHarness:
         assert "minimal_diff" in cats
         assert "proof_check" in cats
 
+    def test_harness_reports_types(self):
+        from xi_eval_harness import run_eval_harness
+        results = {r["task"]: r for r in run_eval_harness()["results"]}
+        assert results["add_constant_to_sum"]["expected_type"] == "Int"
+        assert results["add_string_op"]["expected_type"] == "String"
+
+    def test_reported_types_resolved(self):
+        from xi_eval_harness import build_tasks, _infer_type_str
+        from xi_typecheck import TypeChecker
+        tasks = {t.name: t for t in build_tasks()}
+        r = tasks["simplify_identity"].run(Compiler())
+        assert r["original_type"] == r["expected_type"] == "Int"
+        r = tasks["minimal_add_wrapper"].run(Compiler())
+        assert r["original_type"] == r["expected_type"] == "Int"
+        r = tasks["add_conditional_guard"].run(Compiler())
+        assert r["original_type"] == r["expected_type"] == "Int"
+        node = Compiler().compile_program("def main = λx. x").get("main")
+        assert _infer_type_str(TypeChecker(), node) == "?t1 → ?t1"
+
+    def test_skipped_values_reported_as_none(self):
+        from xi_eval_harness import build_tasks
+        tasks = {t.name: t for t in build_tasks()}
+        r = tasks["minimal_single_constant"].run(Compiler())
+        assert r["status"] == "pass"
+        assert r["original_value"] is None
+        assert r["expected_value"] == 12
+        r = tasks["inline_let"].run(Compiler())
+        assert r["status"] == "pass"
+        assert r["original_value"] == r["expected_value"] == 14
+
+    def test_harness_parallel_matches_serial(self):
+        from xi_eval_harness import run_eval_harness
+        serial = run_eval_harness()
+        parallel = run_eval_harness(jobs=2)
+        assert parallel["by_category"] == serial["by_category"]
+        assert ([r["task"] for r in parallel["results"]]
+                == [r["task"] for r in serial["results"]])
+        types = [(r["original_type"], r["expected_type"])
+                 for r in serial["results"]]
+        assert types == [(r["original_type"], r["expected_type"])
+                         for r in parallel["results"]]
+        assert types == [(r["original_type"], r["expected_type"])
+                         for r in run_eval_harness()["results"]]
+
+
+class TestDataset:
+    def test_template_keeps_literal_braces(self):
+        from xi_dataset import Template
+        t = Template("def main = match B {a} { A → 0 | B x → x }")
+        assert t.keys == ("a",)
+        assert t.render({"a": 7}) == "def main = match B 7 { A → 0 | B x → x }"
+
+    def test_generate_dataset(self, tmp_path):
+        from xi_dataset import generate_dataset
+        generate_dataset(10, output_dir=str(tmp_path))
+        manifest = json.loads((tmp_path / "manifest.json").read_text())
+        assert manifest["count"] == 10
+
+    def test_generate_dataset_parallel_matches_serial(self, tmp_path):
+        from xi_dataset import generate_dataset
+        generate_dataset(6, output_dir=str(tmp_path / "a"), seed=1)
+        generate_dataset(6, output_dir=str(tmp_path / "b"), jobs=2, seed=1)
+        a = json.loads((tmp_path / "a" / "manifest.json").read_text())
+        b = json.loads((tmp_path / "b" / "manifest.json").read_text())
+        assert a == b
+
+
+# ═══════════════════════════════════════════
+# Refactoring
+# ═══════════════════════════════════════════
+
+class TestRefactor:
+    def test_dead_code_elim_ignores_substrings(self):
+        from xi_refactor import RefactoringEngine
+        src = ("def foo = 1\n"
+               "def foobar = 2\n"
+               "def main = foobar -- foo\n")
+        r = RefactoringEngine().dead_code_elim(src)
+        assert r.description == "Dead code elimination: removed foo"
+        assert r.verified
+
+    def test_dead_code_elim_follows_references(self):
+        from xi_refactor import RefactoringEngine
+        src = ("def base = 40\n"
+               "def mid = base + 1\n"
+               "def unused = 7\n"
+               "def main = mid + 1\n")
+        r = RefactoringEngine().dead_code_elim(src)
+        assert r.description == "Dead code elimination: removed unused"
+
+    @pytest.mark.parametrize("src,dead", [
+        ("def z = Zero\ndef main = Succ Zero\n", "z"),
+        ("def three = nat_of_int 3\ndef main = nat_of_int 5\n", "three"),
+        ("def t = True\ndef main = True\n", "t"),
+        ("def n = Nil\ndef k = n\ndef main = Cons 1 Nil\n", "k, n"),
+    ])
+    def test_dead_code_elim_shared_nodes(self, src, dead):
+        # Numerals and constructors are shared nodes, so a def whose body
+        # also appears in main is still dead unless main names it
+        from xi_refactor import RefactoringEngine
+        r = RefactoringEngine().dead_code_elim(src)
+        assert r.description == f"Dead code elimination: removed {dead}"
+        assert r.verified
+
+    def test_dead_code_elim_keeps_constructor_defs_in_use(self):
+        from xi_refactor import RefactoringEngine
+        src = ("def z = Zero\n"
+               "def one = Succ z\n"
+               "def main = Succ one\n")
+        r = RefactoringEngine().dead_code_elim(src)
+        assert r.description == "No dead code found"
+
+    def test_compile_cache_reuses_graphs(self, monkeypatch):
+        from xi_refactor import RefactoringEngine
+        engine = RefactoringEngine()
+        calls = []
+        compile_program = engine.compiler.compile_program_refs
+        monkeypatch.setattr(engine.compiler, "compile_program_refs",
+                            lambda src: calls.append(src) or compile_program(src))
+        src = "def unused = 1\ndef main = 2 + 3"
+        r = engine.dead_code_elim(src)
+        assert r.verified
+        assert r.refactored_result == 5
+        engine.dead_code_elim(src)
+        assert len(calls) == 2   # original and modified, once each
+
+    def test_unchanged_program_has_empty_patch(self):
+        from xi_refactor import RefactoringEngine
+        engine = RefactoringEngine()
+        r = engine.dead_code_elim("def main = 6 * 7")
+        assert r.patch_ops == []
+        assert r.verified and r.refactored_result == 42
+        r = engine.constant_fold("def main = λx. x")
+        assert r.patch_ops == []
+        r = engine.constant_fold("def main = 2 + 3")
+        assert r.patch_ops
+
+    def test_inline_function_whole_identifiers(self):
+        from xi_refactor import RefactoringEngine
+        src = ("def inc x = x + 1\n"
+               "def inc2 x = x + 2\n"
+               "def main = inc (inc2 3)\n")
+        r = RefactoringEngine().inline_function(src, "inc")
+        assert r.verified
+        assert r.refactored_result == 6
+
+    def test_extract_function_preserves_graph(self):
+        from xi_refactor import RefactoringEngine
+        engine = RefactoringEngine()
+        r = engine.extract_function("def k = 3\ndef main = (k + 4) * (k + 4)",
+                                    "k + 4", "k4")
+        assert r.patch_ops == []   # def references share the extracted node
+        assert r.verified and r.refactored_result == 49
+        with pytest.raises(ValueError):
+            engine.extract_function("def main = 23 + 1", "3 + 1")
+        # k + 4 occurs, but the text "k + 4" in 2 * k + 4 is not that subtree
+        with pytest.raises(ValueError, match="would change def main"):
+            engine.extract_function("def k = 3\ndef main = (k + 4) + 2 * k + 4",
+                                    "k + 4", "k4")
+
 
 # ═══════════════════════════════════════════
 # CLI (smoke tests)
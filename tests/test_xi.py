@@ -308,6 +308,34 @@ class TestInterpreter:
     def test_unit_value(self):
         assert self.interp.run(B.unit()) is None
 
+    def test_substitute_shares_closed_subterms(self):
+        closed = B.app(B.app(B.prim(PrimOp.INT_ADD), B.int_lit(1)), B.int_lit(2))
+        body = B.app(B.app(B.prim(PrimOp.INT_MUL), closed), B.var(0))
+        out = self.interp._substitute(body, 0, B.int_lit(7))
+        assert out.children[0].children[1] is closed
+        assert out.children[1].data == 7
+        # indices bound outside the redex shift down; those below it stay
+        outer = B.lam(B.universe(0), B.app(B.var(2), B.var(0)))
+        shifted = self.interp._substitute(outer, 0, B.int_lit(7))
+        assert shifted.children[1].children[0].data == 1
+        assert shifted.children[1].children[1] is outer.children[1].children[1]
+
+    def test_patched_copy_recomputes_free_bound(self):
+        import copy
+        body = B.lam(B.universe(0), B.var(0))
+        self.interp._substitute(body, 0, B.int_lit(1))   # caches bounds
+        clone = copy.deepcopy(body)
+        clone.children[1].data = 1                       # now free
+        assert self.interp._substitute(clone, 0, B.int_lit(5)).children[1].data == 5
+
+    def test_node_edited_between_runs(self):
+        # λx. (λy. 7) x, then the inner body becomes x (index 1) in place
+        inner = B.lam(B.universe(0), B.int_lit(7))
+        prog = B.app(B.lam(B.universe(0), B.app(inner, B.var(0))), B.int_lit(3))
+        assert self.interp.run(prog) == 7
+        inner.children[1] = B.var(1)
+        assert self.interp.run(prog) == 3
+
 
 # ═══════════════════════════════════════════════════════════════
 # TEST: Type Checker
@@ -655,6 +683,71 @@ class TestGraphviz:
         dot = to_dot(lam, "identity")
         assert "body" in dot
 
+    def test_dot_shared_node_emitted_once(self):
+        from xi_graphviz import to_dot
+        shared = B.int_lit(7)
+        dot = to_dot(B.app(B.app(B.prim(PrimOp.INT_ADD), shared), shared), "shared")
+        assert dot.count('[label="7"') == 1
+        assert dot.count(' -> ') == 4
+
+    def test_dot_deep_graph(self):
+        from xi_graphviz import to_dot
+        chain = B.int_lit(0)
+        for _ in range(2000):
+            chain = B.app(B.app(B.prim(PrimOp.INT_ADD), chain), B.int_lit(1))
+        limit = _sys.getrecursionlimit()
+        _sys.setrecursionlimit(1000)   # shallower than the graph
+        try:
+            dot = to_dot(chain, "deep")
+        finally:
+            _sys.setrecursionlimit(limit)
+        assert dot.count(' -> ') == 8000
+
+    @staticmethod
+    def _stub_dot(tmp_path, monkeypatch, body):
+        """Put a fake `dot` shell script first on PATH."""
+        bindir = tmp_path / "bin"
+        bindir.mkdir()
+        script = bindir / "dot"
+        script.write_text("#!/bin/sh\n" + body)
+        script.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bindir}{os.pathsep}{os.environ['PATH']}")
+
+    def test_render_svg(self, tmp_path, monkeypatch):
+        from xi_graphviz import render_graph_svg
+        self._stub_dot(tmp_path, monkeypatch,
+                       "cat > /dev/null\necho '<svg/>'\n")
+        out = tmp_path / "g.svg"
+        assert render_graph_svg(B.int_lit(42), str(out))
+        assert out.read_text() == "<svg/>\n"
+
+    def test_render_svg_dot_fails_early(self, tmp_path, monkeypatch):
+        from xi_graphviz import render_graph_svg
+        # Exits without reading stdin, so writing the graph breaks the pipe
+        self._stub_dot(tmp_path, monkeypatch,
+                       "echo 'syntax error' >&2\nexit 1\n")
+        chain = B.int_lit(0)
+        for _ in range(5000):
+            chain = B.app(B.app(B.prim(PrimOp.INT_ADD), chain), B.int_lit(1))
+        out = tmp_path / "g.svg"
+        try:
+            render_graph_svg(chain, str(out))
+            assert False, "expected RuntimeError"
+        except RuntimeError as e:
+            assert "syntax error" in str(e)
+        assert not out.exists()
+
+    def test_render_svg_batch(self, tmp_path, monkeypatch):
+        from xi_graphviz import render_svg_batch
+        self._stub_dot(tmp_path, monkeypatch,
+                       'shift 2\nfor f in "$@"; do echo "<svg/>" > "$f.svg"; done\n')
+        paths = [tmp_path / "a.dot", tmp_path / "b.dot"]
+        for p in paths:
+            p.write_text("digraph {}")
+        assert render_svg_batch([str(p) for p in paths])
+        assert (tmp_path / "a.svg").exists() and (tmp_path / "b.svg").exists()
+        assert not (tmp_path / "a.dot.svg").exists()
+
 
 # ═══════════════════════════════════════════════════════════════
 # TEST: Compiler (additional)
@@ -773,6 +866,44 @@ class TestPatternMatching:
         result = self.interp.run(B.app(B.app(add, self.nat(2)), self.nat(3)))
         assert self.nat_to_int(self.interp, result) == 5
 
+    def test_builders_share_graph(self):
+        from xi_match import build_nat_mul
+        add = self.build_nat_add()
+        assert self.build_nat_add() is add
+        stack, found = [build_nat_mul()], False
+        while stack and not found:
+            n = stack.pop()
+            found = n is add
+            stack.extend(n.children)
+        assert found
+
+    def test_nat_and_nullary_constr_shared(self):
+        assert self.nat(4) is self.nat(4)
+        assert self.nat(4).children[1] is self.nat(3)
+        assert self.constr(0) is self.NAT_ZERO
+        assert self.nat_to_int(self.interp, self.interp.run(self.nat(4))) == 4
+
+    def test_nat_to_int_long_chain(self):
+        result = self.interp.run(self.nat(2000))
+        assert self.nat_to_int(self.interp, result) == 2000
+
+    def test_nat_to_int_evaluates_unreduced_tail(self):
+        add = self.build_nat_add()
+        node = self.nat_succ(B.app(B.app(add, self.nat(1)), self.nat(1)))
+        assert self.nat_to_int(self.interp, node) == 3
+        assert self.nat_to_int(self.interp, self.nat(5)) == 5
+
+    def test_eval_deep_graph(self):
+        expr = B.int_lit(0)
+        for _ in range(5000):
+            expr = B.app(B.app(B.prim(PrimOp.INT_ADD), expr), B.int_lit(1))
+        limit = _sys.getrecursionlimit()
+        _sys.setrecursionlimit(1000)   # shallower than the graph
+        try:
+            assert self.interp.run(expr) == 5000
+        finally:
+            _sys.setrecursionlimit(limit)
+
     def test_option_none(self):
         result = self.interp.run(
             self.option_match(self.option_none(),
@@ -832,6 +963,14 @@ class TestPatternMatching:
         assert c.index == 2
         assert len(c.args) == 2
 
+    def test_constructor_to_node_cached(self):
+        c = self.Constructor(1, [B.int_lit(1)])
+        node = c.to_node()
+        assert c.to_node() is node
+        c.append(B.int_lit(2))
+        assert c.to_node() is not node
+        assert len(self.Constructor.from_node(c.to_node()).args) == 2
+
 
 # ═══════════════════════════════════════════════════════════════
 # TEST: Module System
@@ -1162,6 +1301,17 @@ class TestOptimizer:
         expr = B.app(B.app(B.prim(PrimOp.INT_ADD), a), b)
         opt = cse(expr)
         assert Interpreter().run(opt) == 6
+        assert opt.children[1] is opt.children[0].children[1]
+
+    def test_cse_deep_graph(self):
+        from xi_optimizer import cse, OptimizerStats
+        expr = B.int_lit(0)
+        for _ in range(5000):
+            expr = B.app(B.app(B.prim(PrimOp.INT_ADD), expr), B.int_lit(1))
+        stats = OptimizerStats()
+        opt = cse(expr, stats)
+        assert stats.cse_shared == 2 * 5000 - 2
+        assert opt.children[1] is opt.children[0].children[1].children[1]
 
     def test_optimize_reduces_size(self):
         from xi_optimizer import optimize
@@ -1171,12 +1321,53 @@ class TestOptimizer:
         assert Interpreter().run(opt) == 900
         assert len(serialize(opt)) < len(serialize(expr))
 
+    def test_fused_matches_separate_passes(self):
+        from xi_optimizer import optimize
+        a = B.app(B.app(B.prim(PrimOp.INT_ADD), B.var(0)), B.int_lit(2))
+        b = B.app(B.app(B.prim(PrimOp.INT_ADD), B.var(0)), B.int_lit(2))
+        three = B.app(B.app(B.prim(PrimOp.INT_ADD), B.int_lit(1)), B.int_lit(2))
+        expr = B.lam(B.universe(0), B.app(B.app(B.prim(PrimOp.INT_MUL), a),
+                                          B.app(B.app(B.prim(PrimOp.INT_ADD), b), three)))
+        fused, fs = optimize(expr)
+        separate, ss = optimize(expr, ['fold', 'cse', 'dce'])
+        assert serialize(fused) == serialize(separate)
+        assert (fs.constants_folded, fs.cse_shared) == (ss.constants_folded, ss.cse_shared)
+        assert Interpreter().run(B.app(fused, B.int_lit(4))) == 6 * 9
+
     def test_fold_string_concat(self):
         from xi_optimizer import constant_fold
         expr = B.app(B.app(B.prim(PrimOp.STR_CONCAT), B.str_lit("a")), B.str_lit("b"))
         folded = constant_fold(expr)
         assert Interpreter().run(folded) == "ab"
 
+    def test_constant_fold_deep_chain(self):
+        from xi_optimizer import constant_fold
+        expr = B.int_lit(0)
+        for _ in range(5000):
+            expr = B.app(B.app(B.prim(PrimOp.INT_ADD), expr), B.int_lit(1))
+        limit = _sys.getrecursionlimit()
+        _sys.setrecursionlimit(1000)   # shallower than the graph
+        try:
+            folded = constant_fold(expr)
+        finally:
+            _sys.setrecursionlimit(limit)
+        assert folded.prim_op == PrimOp.INT_LIT and folded.data == 5000
+
+    def test_constant_fold_shared_subterms(self):
+        from xi_optimizer import constant_fold
+        shared = B.app(B.app(B.prim(PrimOp.INT_ADD), B.int_lit(1)), B.var(0))
+        expr = B.app(B.app(B.prim(PrimOp.INT_MUL), shared), shared)
+        assert constant_fold(expr) is expr
+        shared = B.app(B.app(B.prim(PrimOp.INT_ADD), B.int_lit(1)), B.int_lit(2))
+        expr = B.app(B.app(B.prim(PrimOp.INT_MUL), shared), shared)
+        folded = constant_fold(expr)
+        assert folded.prim_op == PrimOp.INT_LIT and folded.data == 9
+
+    def test_fold_skips_division_by_zero(self):
+        from xi_optimizer import constant_fold
+        expr = B.app(B.app(B.prim(PrimOp.INT_DIV), B.int_lit(1)), B.int_lit(0))
+        assert constant_fold(expr) is expr
+
 
 # ═══════════════════════════════════════════════════════════════
 # XiC COMPRESSION TESTS
@@ -1193,6 +1384,10 @@ class TestXiCompressed:
         from xi_compress import compress, decompress
         assert Interpreter().run(decompress(compress(B.int_lit(-999)))) == -999
 
+    def test_roundtrip_big_int(self):
+        from xi_compress import compress, decompress
+        assert Interpreter().run(decompress(compress(B.int_lit(-2**70)))) == -2**70
+
     def test_roundtrip_string(self):
         from xi_compress import compress, decompress
         assert Interpreter().run(decompress(compress(B.str_lit("test")))) == "test"
@@ -1220,6 +1415,39 @@ class TestXiCompressed:
         data = compress(B.int_lit(1))
         assert data[:3] == XIC_MAGIC
 
+    def test_small_payload_stored(self):
+        from xi_compress import compress, decompress, CODEC_RAW
+        data = compress(B.int_lit(1))
+        assert data[4] == CODEC_RAW
+        assert Interpreter().run(decompress(data)) == 1
+
+    def test_decodes_v1_header(self):
+        from xi_compress import (compress, decompress, _parse_header,
+                                 _unpack_payload, XIC_MAGIC)
+        import zlib
+        chain = B.int_lit(0)
+        for i in range(1, 51):
+            chain = B.app(B.app(B.prim(PrimOp.INT_ADD), chain), B.int_lit(i))
+        codec, _, packed = _parse_header(compress(chain))
+        payload = _unpack_payload(codec, packed)
+        v2 = (XIC_MAGIC + bytes([0x02, codec]) + len(payload).to_bytes(2, 'big')
+              + len(packed).to_bytes(2, 'big') + packed)
+        assert Interpreter().run(decompress(v2)) == sum(range(51))
+        body = zlib.compress(payload, 9)
+        v1 = (XIC_MAGIC + bytes([0x01]) + len(payload).to_bytes(2, 'big')
+              + len(body).to_bytes(2, 'big') + body)
+        assert Interpreter().run(decompress(v1)) == sum(range(51))
+
+    def test_payload_over_64k(self):
+        from xi_compress import compress, decompress, _parse_header
+        chain = B.int_lit(0)
+        for i in range(1, 10001):
+            chain = B.app(B.app(B.prim(PrimOp.INT_ADD), chain), B.int_lit(i))
+        data = compress(chain)
+        assert _parse_header(data)[1] > 0xFFFF
+        root = decompress(data)
+        assert root.tag == Tag.APP and root.children[1].data == 10000
+
     def test_dedup_repeated_subtrees(self):
         from xi_compress import compress, decompress
         sub = B.app(B.app(B.prim(PrimOp.INT_MUL), B.int_lit(7)), B.int_lit(13))
@@ -1227,6 +1455,43 @@ class TestXiCompressed:
                      B.app(B.app(B.prim(PrimOp.INT_MUL), B.int_lit(7)), B.int_lit(13)))
         assert Interpreter().run(decompress(compress(expr))) == 182
 
+    def test_dedup_keeps_distinct_literals(self):
+        from xi_compress import _dedup_collect
+        zero = Node(Tag.PRIM, prim_op=PrimOp.FLOAT_LIT, data=0.0)
+        neg_zero = Node(Tag.PRIM, prim_op=PrimOp.FLOAT_LIT, data=-0.0)
+        expr = B.app(B.app(B.prim(PrimOp.INT_ADD), B.int_lit(1)), B.int_lit(1))
+        nodes, _, _ = _dedup_collect(B.app(B.app(expr, zero), neg_zero))
+        assert sum(n.prim_op == PrimOp.FLOAT_LIT for n in nodes) == 2
+        assert sum(n.prim_op == PrimOp.INT_LIT for n in nodes) == 1
+
+    def test_compress_deep_chain(self):
+        from xi_compress import compress, decompress
+        chain = B.int_lit(0)
+        for _ in range(5000):
+            chain = B.app(B.app(B.prim(PrimOp.INT_ADD), chain), B.int_lit(1))
+        limit = _sys.getrecursionlimit()
+        _sys.setrecursionlimit(1000)   # deeper than the stack allows
+        try:
+            data = compress(chain)
+        finally:
+            _sys.setrecursionlimit(limit)
+        root = decompress(data)
+        assert root.tag == Tag.APP and root.children[1].data == 1
+
+    def test_varint_boundaries(self):
+        from xi_compress import _encode_varint, _decode_varint
+        for v in (0, 0x7F, 0x80, 0x3FFF, 0x4000, 2**35, 2**64 + 1):
+            buf = bytearray()
+            _encode_varint(v, buf)
+            assert _decode_varint(bytes(buf), 0) == (v, len(buf))
+
+    def test_signed_varint_boundaries(self):
+        from xi_compress import _encode_signed_varint, _decode_signed_varint
+        for v in (0, -1, 63, -64, 64, -65, 2**40, -2**63):
+            buf = bytearray()
+            _encode_signed_varint(v, buf)
+            assert _decode_signed_varint(bytes(buf), 0) == (v, len(buf))
+
 
 # ═══════════════════════════════════════════════════════════════
 # SURFACE SYNTAX PARSER TESTS
@@ -1373,6 +1638,12 @@ class TestSurfaceSyntaxParser:
     def test_match_extract_pred(self):
         assert self._run("match Succ (Succ (Succ Zero)) { Zero → Zero | Succ k → k }") == 2
 
+    def test_nat_of_int(self):
+        assert self._run("match nat_of_int 3 { Zero → Zero | Succ k → k }") == 2
+
+    def test_nat_of_int_shadowed(self):
+        assert self._run("let nat_of_int = λx. x + 1 in nat_of_int 3") == 4
+
     def test_match_option_none(self):
         assert self._run("match None { None → 0 | Some x → x }") == 0
 
@@ -1666,6 +1937,22 @@ class TestHMInference:
     def test_let_binding(self):
         assert self._infer("let x = 5 in x + x") == "Int"
 
+    def test_match_unifies_type_vars(self):
+        """Unifying two fresh type variables must not crash the occurs check."""
+        assert self._infer("if 3 < 5 then 1 else 0") == "Int"
+
+    def test_if_branch_types(self):
+        assert self._infer('if 1 < 2 then "a" else "b"') == "String"
+        assert self._infer("(λx. if x > 0 then x * x else 0) 5") == "Int"
+
+    def test_self_application_rejected(self):
+        from xi_typecheck import TypeChecker, TypeErr, Context
+        from xi_compiler import Compiler
+        import pytest
+        graph = Compiler().compile_expr("(λf. f f) (λx. x)")
+        with pytest.raises(TypeErr):
+            TypeChecker().infer(Context(), graph)
+
     def test_type_error_add_string(self):
         from xi_typecheck import TypeChecker, TypeErr, Context
         from xi_compiler import Compiler
@@ -1721,6 +2008,73 @@ class TestErrorMessages:
             assert "^" in msg  # pointer to error location
 
 
+class TestRepl:
+    def setup_method(self):
+        from xi_repl import Repl
+        self.repl = Repl()
+
+    def _out(self, capsys, *lines):
+        capsys.readouterr()
+        for line in lines:
+            self.repl.dispatch(line)
+        return capsys.readouterr().out
+
+    def test_dispatch_eval_and_def(self, capsys):
+        assert self._out(capsys, "def sq x = x * x", "sq 7").endswith("  49\n")
+
+    def test_dispatch_commands(self, capsys):
+        assert self._out(capsys, ":type 1 + 2").strip() == "Int"
+        assert self._out(capsys, ":defs").strip() == "No definitions."
+        out = self._out(capsys, ":opt (2 + 3) * 4")
+        assert "Result: 20" in out
+
+    def test_dispatch_falls_back_to_eval(self):
+        # A command word without its argument (or with one it does not
+        # take), or "def" alone, is read as an expression
+        seen = []
+        self.repl.cmd_eval = seen.append
+        for line in (":tree", ":help me", "def", "1 + 2"):
+            self.repl.dispatch(line)
+        assert seen == [":tree", ":help me", "def", "1 + 2"]
+
+    def test_compile_cache_cleared_by_def(self, capsys):
+        assert self._out(capsys, "def k = 1", "k + 1").endswith("  2\n")
+        assert self._out(capsys, "def k = 5", "k + 1").endswith("  6\n")
+
+    def test_history_file_trimmed_on_load(self, tmp_path, monkeypatch):
+        import readline, xi_repl
+        monkeypatch.setattr(xi_repl, "_HISTORY_LENGTH", 10)
+        histfile = tmp_path / "hist"
+        histfile.write_text("".join(f"line{i}\n" for i in range(25)))
+        readline.clear_history()
+        try:
+            self.repl._open_history(str(histfile))
+            assert readline.get_current_history_length() == 10
+            assert readline.get_history_item(1) == "line15"
+            assert readline.get_history_item(10) == "line24"
+        finally:
+            readline.clear_history()
+
+    def test_history_appended_per_command(self, tmp_path, monkeypatch):
+        import readline, xi_repl
+        monkeypatch.setattr(xi_repl, "_HISTORY_LENGTH", 3)
+        histfile = tmp_path / "hist"
+        readline.clear_history()
+        try:
+            self.repl._open_history(str(histfile))
+            assert histfile.exists()
+            for i in range(5):
+                readline.add_history(f"cmd{i}")   # what input() does
+                self.repl._record_history(f"cmd{i}")
+            assert readline.get_current_history_length() == 3
+            assert readline.get_history_item(1) == "cmd2"
+            if hasattr(readline, "append_history_file"):
+                lines = histfile.read_text().split()
+                assert lines[-3:] == ["cmd2", "cmd3", "cmd4"]
+        finally:
+            readline.clear_history()
+
+
 class TestEndToEndPipeline:
     """Test full pipeline: source → parse → optimize → serialize → run."""
 